@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Benchmark the main routes against synthetic data.
+
+    python benchmark.py                          # 1k and 100k rows, CSV backend
+    python benchmark.py --rows 1000,100000,1000000 --backend sqlite
+    python benchmark.py --out bench.json --compare baseline.json
+
+Each data size runs in its own process, against a scratch copy of the site
+(code, templates and static files are symlinked; database.csv and
+testimonials.csv are generated). SMTP and reCAPTCHA are replaced by local
+stand-ins on 127.0.0.1. None of the benchmarked routes touches MySQL, so no
+MySQL stand-in is started.
+
+For every route the script records throughput and p50/p99/max latency and
+writes them as JSON. ``--compare`` exits non-zero if any route's p50 is more
+than ``--tolerance`` slower than in the baseline file.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import platform
+import threading
+import subprocess
+import socketserver
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# All the scratch site links from the checkout besides the *.py files. Data
+# files and their journals, locks and caches are never linked, so a run can't
+# write to the live ones.
+SITE_FILES = ("static", "templates", "robots.txt", "schema.sql")
+ROUTES = ("/", "/reviews", "/submissions", "/send-email", "/accept", "/complete", "/delete")
+STATUSES = ("inbox", "inbox", "inbox", "accepted", "completed", "trash")
+FIRST_NAMES = ("Ana", "Ben", "Carla", "Dev", "Eli", "Fay", "Gus", "Hana", "Ivan", "June")
+CARS = ("2019 Civic", "2004 350z", "1995 240sx", "2015 Camaro", "2021 Model 3", "2008 Miata")
+
+
+# Stand-ins ------------------------------------------------------------------
+
+class _SMTPSink(socketserver.StreamRequestHandler):
+    """Accepts and discards mail; enough of SMTP for smtplib without TLS/AUTH."""
+
+    def handle(self):
+        self.wfile.write(b"220 bench ESMTP\r\n")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    self.wfile.write(b"250 OK\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.wfile.write(b"250-bench\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class _RecaptchaStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stand_ins():
+    smtp = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPSink)
+    smtp.daemon_threads = True
+    captcha = ThreadingHTTPServer(("127.0.0.1", 0), _RecaptchaStub)
+    for server in (smtp, captcha):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return smtp.server_address[1], f"http://127.0.0.1:{captcha.server_address[1]}/siteverify"
+
+
+# Synthetic data --------------------------------------------------------------
+
+def seed(site_dir, rows, testimonials):
+    from submission_store import HEADERS
+    from storage import TESTIMONIAL_FIELDS
+
+    rng = random.Random(rows)
+    start = datetime(2024, 1, 1)
+    with open(os.path.join(site_dir, "database.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for i in range(rows):
+            name = rng.choice(FIRST_NAMES)
+            empty = rng.random() < 0.02  # the odd bot submission
+            writer.writerow([
+                f"bench-{i:08d}",
+                (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"),
+                "" if empty else f"{name} {i}",
+                "" if empty else f"{name.lower()}{i}@example.com",
+                "" if empty else rng.choice(CARS),
+                "" if empty else f"555-{rng.randrange(10000):04d}",
+                rng.choice(("yes", "no")),
+                rng.choice(("phone", "email", "text")),
+                "Morning", "", "" if empty else "Full detail please",
+                "Sedan", "Interior, Exterior", str(rng.randrange(100, 900)),
+                "inbox" if empty else rng.choice(STATUSES),
+            ])
+    with open(os.path.join(site_dir, "testimonials.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for i in range(testimonials):
+            row = {
+                "name": rng.choice(FIRST_NAMES), "car": rng.choice(CARS),
+                "date": (start + timedelta(days=i % 700)).strftime("%Y-%m-%d"),
+                "testimonial": "Looks brand new. " * rng.randrange(1, 6),
+                "before": f"before_{i}.jpg", "after": f"after_{i}.jpg", "service_type": "ceramic",
+            }
+            writer.writerow([row[field] for field in TESTIMONIAL_FIELDS])
+
+
+def make_site(workdir):
+    """Scratch copy of the site: the code, templates and static files symlinked."""
+    site_dir = os.path.join(workdir, "site")
+    os.makedirs(site_dir)
+    for name in os.listdir(BASE_DIR):
+        if name.endswith(".py") or name in SITE_FILES:
+            os.symlink(os.path.join(BASE_DIR, name), os.path.join(site_dir, name))
+    return site_dir
+
+
+# Measurement -----------------------------------------------------------------
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(app, route, make_request, requests, concurrency):
+    """Run ``requests`` calls of ``make_request(client, i)`` over ``concurrency`` threads."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["logged_in"] = True
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            response = make_request(client, i)
+            response.get_data()  # drain streamed bodies
+            local.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+            response.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "route": route,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rate_limited": errors.count(429),
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def run_size(rows, backend, requests, concurrency, routes):
+    """Child process: build a site with ``rows`` submissions and benchmark it."""
+    workdir = tempfile.mkdtemp(prefix="ds-bench-")
+    try:
+        site_dir = make_site(workdir)
+        sys.path.insert(0, site_dir)
+        os.chdir(site_dir)
+        smtp_port, captcha_url = start_stand_ins()
+        os.environ.update({
+            "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(smtp_port), "SMTP_USE_TLS": "0",
+            "EMAIL_USER": "bench@example.com", "EMAIL_PASS": "bench",
+            "RECAPTCHA_VERIFY_URL": captcha_url, "RECAPTCHA_SECRET_KEY": "bench",
+            "STORAGE_BACKEND": backend, "SQLITE_PATH": os.path.join(site_dir, "site.db"),
+            "MAIL_QUEUE_DB": os.path.join(site_dir, "mail_queue.db"),
+            "QUOTE_PDF_DIR": os.path.join(site_dir, "quote_pdfs"),
+            "PAGE_CACHE_DIR": os.path.join(site_dir, "page_cache"),
+            "RATE_LIMIT_DB": os.path.join(site_dir, "rate_limit.db"),
+            # Every request comes from one client and one address; measure
+            # the form, not the rate limiter turning it away.
+            "RATE_LIMIT_BACKEND": "memory",
+            "SEND_EMAIL_RATE_IP": "1000000000/1", "SEND_EMAIL_RATE_EMAIL": "1000000000/1",
+        })
+        started = time.perf_counter()
+        seed(site_dir, rows, testimonials=max(10, rows // 100))
+        if backend == "sqlite":
+            from storage import migrate
+            migrate(os.path.join(site_dir, "database.csv"), os.path.join(site_dir, "testimonials.csv"),
+                    os.environ["SQLITE_PATH"])
+        seed_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        import server
+        server.app.config["TESTING"] = True
+        server.store.rows()  # first load of the store is reported separately
+        load_seconds = time.perf_counter() - started
+
+        ids = [f"bench-{i:08d}" for i in range(rows)]
+        rng = random.Random(0)
+        form = {
+            "name": "Bench", "email": "bench@example.com", "car": "2019 Civic", "phone": "555-0100",
+            "message": "Benchmark", "vehicle_type": "Sedan", "services[]": ["Interior"], "total": "250",
+            "g-recaptcha-response": "bench",
+        }
+        requests_for = {
+            "/": lambda c, i: c.get("/"),
+            "/reviews": lambda c, i: c.get("/reviews"),
+            "/submissions": lambda c, i: c.get("/submissions"),
+            "/send-email": lambda c, i: c.post("/send-email", data=form),
+            "/accept": lambda c, i: c.post(f"/accept/{rng.choice(ids)}"),
+            "/complete": lambda c, i: c.post(f"/complete/{rng.choice(ids)}"),
+            "/delete": lambda c, i: c.post(f"/delete/{rng.choice(ids)}"),
+        }
+        results = []
+        for route in routes:
+            measure(server.app, route, requests_for[route], min(5, requests), 1)  # warm up
+            result = measure(server.app, route, requests_for[route], requests, concurrency)
+            if result["rate_limited"]:
+                raise SystemExit(f"❌ {route} answered 429 {result['rate_limited']} times; "
+                                 "the rate limits are meant to be off here")
+            result["rows"] = rows
+            results.append(result)
+            print(f"  {rows:>8} rows  {route:<13} {result['rps']:>8} req/s  "
+                  f"p50 {result['p50_ms']:>8} ms  p99 {result['p99_ms']:>8} ms", file=sys.stderr)
+        server.mail_queue.stop()
+        try:
+            import resource
+            peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        except ImportError:
+            peak_rss_mb = None
+        return {
+            "rows": rows, "seed_seconds": round(seed_seconds, 2), "load_seconds": round(load_seconds, 3),
+            "peak_rss_mb": peak_rss_mb, "routes": results,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(report, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {(r["rows"], r["route"]): r for size in baseline["sizes"] for r in size["routes"]}
+    regressions = []
+    for size in report["sizes"]:
+        for r in size["routes"]:
+            old = before.get((r["rows"], r["route"]))
+            if old and r["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{r['route']} @ {r['rows']} rows: p50 {old['p50_ms']} -> {r['p50_ms']} ms")
+    for line in regressions:
+        print(f"❌ {line}")
+    if not regressions:
+        print(f"✅ No p50 regressions beyond {tolerance:.0%} against {baseline_path}")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site's main routes.")
+    parser.add_argument("--rows", default="1000,100000", help="comma-separated submission counts")
+    parser.add_argument("--backend", choices=("csv", "sqlite"), default="csv")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads per route")
+    parser.add_argument("--routes", default=",".join(ROUTES))
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    routes = [r for r in args.routes.split(",") if r]
+
+    if args.child is not None:
+        # The app's own print() logging would swamp the progress lines.
+        real_stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        result = run_size(args.child, args.backend, args.requests, args.concurrency, routes)
+        json.dump(result, real_stdout)
+        return 0
+
+    sizes = []
+    for rows in (int(n) for n in args.rows.split(",")):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(rows), "--backend", args.backend,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--routes", ",".join(routes)],
+            check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        sizes.append(json.loads(output))
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "backend": args.backend,
+            "requests": args.requests, "concurrency": args.concurrency,
+        },
+        "sizes": sizes,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {args.out}")
+    if args.compare:
+        return 0 if compare(report, args.compare, args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
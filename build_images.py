@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Recompress the static/images gallery into responsive WebP/JPEG variants.
+
+    python build_images.py            # only new or changed images
+    python build_images.py --force    # rebuild everything
+    python build_images.py --uploads  # testimonial uploads, see below
+
+Variants go to static/images/optimized/ with a manifest.json mapping each
+original filename to its sizes; the ``static_image`` template helper in
+server.py reads it. Images whose content hash matches the manifest are
+skipped, so re-running after adding a photo only processes that photo.
+
+``--uploads`` does the same for the testimonial photos in uploads/ (variants
+in static/uploads/variants/, as the server writes them). Uploads used to be
+saved under static/uploads, where their EXIF/GPS metadata was public; any
+still there are moved into uploads/ first.
+"""
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from image_pipeline import process_image, content_hash, VariantManifest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(BASE_DIR, "static", "images")
+OUT_DIR = os.path.join(IMAGES_DIR, "optimized")
+MANIFEST_PATH = os.path.join(OUT_DIR, "manifest.json")
+UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
+UPLOADS_OUT_DIR = os.path.join(BASE_DIR, "static", "uploads", "variants")
+LEGACY_UPLOADS_DIR = os.path.join(BASE_DIR, "static", "uploads")
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+
+
+def _is_current(entry, digest, out_dir):
+    return (
+        entry is not None
+        and entry.get("hash") == digest
+        and all(
+            os.path.exists(os.path.join(out_dir, v[ext]))
+            for v in entry["variants"].values()
+            for ext in ("webp", "jpeg")
+        )
+    )
+
+
+def find_images(images_dir):
+    return sorted(
+        name for name in os.listdir(images_dir)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        and os.path.isfile(os.path.join(images_dir, name))
+    )
+
+
+def build(images_dir=IMAGES_DIR, out_dir=OUT_DIR, manifest_path=MANIFEST_PATH, workers=None, force=False):
+    manifest = VariantManifest(manifest_path)
+    existing = manifest.load()
+    names = find_images(images_dir)
+    todo = [
+        name for name in names
+        if force or not _is_current(existing.get(name), content_hash(os.path.join(images_dir, name)), out_dir)
+    ]
+    print(f"{len(names) - len(todo)} images up to date, {len(todo)} to build")
+
+    results, failed = {}, 0
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(process_image, os.path.join(images_dir, name), out_dir): name for name in todo}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                    print(f"✅ {name}")
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ {name}: {e}")
+
+    stale = set(existing) - set(names)
+    if results or stale:
+        data = manifest.update(results, remove=stale)
+        manifest_name = os.path.basename(manifest_path)
+        _remove_orphans(out_dir, data, keep={manifest_name, manifest_name + ".lock"})
+    return failed
+
+
+def move_legacy_uploads(legacy_dir=LEGACY_UPLOADS_DIR, uploads_dir=UPLOADS_DIR):
+    """Move uploads out of static/, where anyone could fetch them, into uploads/."""
+    if not os.path.isdir(legacy_dir):
+        return
+    os.makedirs(uploads_dir, exist_ok=True)
+    for name in find_images(legacy_dir):
+        os.replace(os.path.join(legacy_dir, name), os.path.join(uploads_dir, name))
+        print(f"✅ Moved {name} out of static/uploads")
+
+
+def _remove_orphans(out_dir, data, keep):
+    """Delete variant files that no manifest entry points at any more."""
+    keep = keep | {v[ext] for entry in data.values() for v in entry["variants"].values() for ext in ("webp", "jpeg")}
+    for name in os.listdir(out_dir):
+        # .tmp files belong to variants still being written by the server.
+        if name not in keep and not name.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="rebuild images even if unchanged")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument("--uploads", action="store_true",
+                        help="build testimonial uploads instead")
+    args = parser.parse_args()
+    if args.uploads:
+        move_legacy_uploads()
+        failed = build(UPLOADS_DIR, UPLOADS_OUT_DIR, os.path.join(UPLOADS_OUT_DIR, "manifest.json"),
+                       workers=args.workers, force=args.force)
+    else:
+        failed = build(workers=args.workers, force=args.force)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Write .gz (and, if the brotli package is installed, .br) siblings for the
+text files under static/, so the server can send them precompressed.
+
+    python compress_assets.py
+
+Re-run after changing CSS/JS; files whose siblings are already newer than
+the source are skipped. Siblings that aren't smaller than the source are
+not kept.
+"""
+import os
+
+from compression import COMPRESSIBLE_EXTENSIONS, PRECOMPRESSED, compress, available_encodings
+from file_lock import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+SKIP_DIRS = {"uploads", "sass"}
+
+
+def compress_tree(root=STATIC_DIR):
+    written = skipped = 0
+    encodings = available_encodings()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            mtime = os.stat(path).st_mtime_ns
+            data = None
+            for encoding, suffix in PRECOMPRESSED:
+                target = path + suffix
+                if encoding not in encodings:
+                    continue
+                if os.path.exists(target) and os.stat(target).st_mtime_ns >= mtime:
+                    skipped += 1
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                body = compress(data, encoding)
+                if len(body) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with atomic_write(target, encoding=None) as f:
+                    f.write(body)
+                written += 1
+                print(f"✅ {os.path.relpath(target, root)} ({len(data)} -> {len(body)} bytes)")
+    if "br" not in encodings:
+        print("brotli isn't installed; wrote gzip only (pip install brotli for .br files)")
+    print(f"{written} written, {skipped} up to date")
+    return written
+
+
+if __name__ == "__main__":
+    compress_tree()
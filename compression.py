@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Types worth compressing; images and fonts like woff2 are compressed already.
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/xml", "text/javascript",
+    "application/javascript", "application/json", "application/xml", "image/svg+xml",
+}
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".html", ".json", ".xml", ".svg", ".txt", ".ttf", ".eot", ".otf")
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+MIN_SIZE = 500
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli else ("gzip",)
+
+
+def accepted_encodings(header):
+    """Parse Accept-Encoding into {coding: q}, dropping anything with q=0."""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return {coding: q for coding, q in accepted.items() if q > 0}
+
+
+def negotiate(header, offered):
+    """Best of ``offered`` (in server preference order) the client accepts, or None."""
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, encoding, level=None):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if level is None else level)
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+def is_compressible(mimetype):
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+class CompressedCache:
+    """
+    LRU of compressed bodies keyed on a hash of the uncompressed bytes, so a
+    page that renders identically (the cached homepage, a static listing) is
+    only compressed once per encoding.
+    """
+
+    def __init__(self, max_entries=128, gzip_level=6, br_quality=5):
+        self.max_entries = max_entries
+        self.levels = {"gzip": gzip_level, "br": br_quality}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, data, encoding):
+        key = (hashlib.sha1(data).digest(), encoding)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = compress(data, encoding, self.levels[encoding])
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
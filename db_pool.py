@@ -0,0 +1,120 @@
+import time
+import threading
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection frees up within the pool's timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    ``connect`` is any zero-argument factory returning a connection that
+    may be used from whichever thread checks it out (``pymysql.connect``
+    with its settings bound; for SQLite that means
+    ``functools.partial(sqlite3.connect, path, check_same_thread=False)``,
+    as plain ``sqlite3.connect`` needs a path and ties each connection to
+    the thread that opened it). At most
+    ``max_size`` connections exist at once; callers wait up to ``timeout``
+    seconds for one. Connections older than ``max_lifetime`` are closed
+    instead of reused, and every checkout is liveness-checked
+    (``ping(reconnect=True)`` on MySQL, ``SELECT 1`` elsewhere).
+    """
+
+    def __init__(self, connect, max_size=5, max_lifetime=280, timeout=10):
+        self.connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._idle = []  # (conn, created_at)
+        self._created_at = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._stats = {"created": 0, "reused": 0, "recycled": 0, "broken": 0, "waits": 0, "timeouts": 0}
+
+    def get(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise PoolTimeout(f"No database connection free after {self.timeout}s")
+        try:
+            return self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, created_at = self._idle.pop()
+            if time.monotonic() - created_at > self.max_lifetime:
+                self._close(conn, "recycled")
+                continue
+            if not _is_alive(conn):
+                self._close(conn, "broken")
+                continue
+            with self._lock:
+                self._stats["reused"] += 1
+            return conn
+        conn = self.connect()
+        with self._lock:
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats["created"] += 1
+        return conn
+
+    def put(self, conn, discard=False):
+        """Return a connection; pass ``discard=True`` if it may be unusable."""
+        try:
+            if not discard:
+                try:
+                    conn.rollback()  # never hand out someone else's open transaction
+                except Exception:
+                    discard = True
+            if discard:
+                self._close(conn, "broken")
+            else:
+                with self._lock:
+                    self._idle.append((conn, self._created_at.get(id(conn), time.monotonic())))
+        finally:
+            self._slots.release()
+
+    def _close(self, conn, reason):
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+            self._stats[reason] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn, "recycled")
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+            stats["open"] = len(self._created_at)
+        stats["in_use"] = stats["open"] - stats["idle"]
+        stats["max_size"] = self.max_size
+        return stats
+
+
+def _is_alive(conn):
+    try:
+        if hasattr(conn, "ping"):
+            conn.ping(reconnect=True)
+        else:
+            conn.execute("SELECT 1")
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Email staff one CSV of the quotes received since the last digest.
+
+Meant to run as a scheduled task (e.g. daily on PythonAnywhere):
+
+    python digest.py
+
+The last digest's position is kept in digest_state.json, so a run that
+finds nothing new sends nothing and a failed send is retried next run.
+"""
+import os
+import json
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from file_lock import atomic_write
+from submission_store import rows_to_csv
+from storage import open_submission_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Same settings as the web app, which keeps them in .env.
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+DATA_CSV = os.path.join(BASE_DIR, "database.csv")
+STATE_PATH = os.path.join(BASE_DIR, "digest_state.json")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(BASE_DIR, "site.db"))
+
+CONTENT_FIELDS = ("Name", "Email", "Car", "Phone", "Message")
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_timestamp": "", "ids_at_last": []}
+
+
+def save_state(state, path=STATE_PATH):
+    with atomic_write(path) as f:
+        json.dump(state, f)
+
+
+def new_rows_since(rows, state):
+    """
+    Rows newer than the last digest. Timestamps only have one-second
+    resolution, so ids already sent at the boundary second are remembered.
+    """
+    last = state.get("last_timestamp", "")
+    seen = set(state.get("ids_at_last", []))
+    fresh = [
+        row for row in rows
+        if (row.get("Timestamp", "") > last or (row.get("Timestamp", "") == last and row["id"] not in seen))
+        and any(row.get(f, "").strip() for f in CONTENT_FIELDS)  # skip empty bot rows
+    ]
+    fresh.sort(key=lambda row: row.get("Timestamp", ""))
+    return fresh
+
+
+def advance_state(state, sent):
+    if not sent:
+        return state
+    last = sent[-1]["Timestamp"]
+    ids = [row["id"] for row in sent if row["Timestamp"] == last]
+    if last == state.get("last_timestamp"):
+        ids += state.get("ids_at_last", [])
+    return {"last_timestamp": last, "ids_at_last": ids}
+
+
+def send_digest(csv_path=DATA_CSV, state_path=STATE_PATH):
+    # Imported here so the helpers above work without SMTP settings.
+    from email_service import deliver_email_with_csv
+
+    state = load_state(state_path)
+    store = open_submission_store(STORAGE_BACKEND, csv_path, SQLITE_PATH)
+    rows = new_rows_since(store.rows(), state)
+    if not rows:
+        print("No new quotes since the last digest.")
+        return 0
+    first, last = rows[0]["Timestamp"], rows[-1]["Timestamp"]
+    body = f"{len(rows)} new quote request(s) between {first} and {last}:\n\n"
+    body += "\n".join(
+        f"- {row['Timestamp']}  {row['Name']} <{row['Email']}>  {row['Car']}  ${row.get('Total') or '0'}"
+        for row in rows
+    )
+    filename = f"quotes-{datetime.now().strftime('%Y%m%d-%H%M')}.csv"
+    deliver_email_with_csv(f"DS Auto Care quote digest ({len(rows)} new)", body, filename, rows_to_csv(rows))
+    save_state(advance_state(state, rows), state_path)
+    print(f"✅ Sent digest with {len(rows)} quotes")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    send_digest()
@@ -1,60 +1,118 @@
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import threading
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# smtplib and the email.mime modules are imported on first send, so a
+# worker that never sends mail never pays for them.
 
-# Validate required environment variables
 required_vars = ['SMTP_SERVER', 'SMTP_PORT', 'EMAIL_PASS']
-for var in required_vars:
-    if not os.getenv(var):
-        raise EnvironmentError(f"Missing required environment variable: {var}")
+
+def check_env():
+    """Load .env and make sure the SMTP settings are there; raises if not."""
+    load_dotenv()
+    for var in required_vars:
+        if not os.getenv(var):
+            raise EnvironmentError(f"Missing required environment variable: {var}")
+
+def smtp_uses_tls():
+    # Set SMTP_USE_TLS=0 to talk to a plain local relay (e.g. aiosmtpd or
+    # `python -m smtpd -n -c DebuggingServer`) that has no STARTTLS/AUTH.
+    return os.getenv('SMTP_USE_TLS', '1').strip().lower() not in ('0', 'false', 'no')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_smtp_pool():
+    """One pool of logged-in SMTP sessions per process, shared by every sender."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            check_env()
+            from smtp_pool import SMTPPool
+            _pool = SMTPPool(
+                os.getenv('SMTP_SERVER'),
+                int(os.getenv('SMTP_PORT')),
+                username=os.getenv('EMAIL_USER'),
+                password=os.getenv('EMAIL_PASS'),
+                use_tls=smtp_uses_tls(),
+                max_size=int(os.getenv('SMTP_POOL_SIZE', 2)),
+                idle_timeout=int(os.getenv('SMTP_IDLE_TIMEOUT', 60)),
+            )
+        return _pool
+
+def text_message(to, subject, body):
+    """A plain-text email from EMAIL_USER, ready for ``send_message``."""
+    from email.mime.text import MIMEText
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['From'] = os.getenv('EMAIL_USER')
+    msg['To'] = to
+    msg['Subject'] = subject
+    return msg
+
+def deliver_email(to, subject, body):
+    """Send a plain-text email through the shared pool; raises on failure."""
+    sender_email = os.getenv('EMAIL_USER')
+    get_smtp_pool().send_message(text_message(to, subject, body), sender_email, [to])
+
+def deliver_email_with_attachment(subject, body, csv_file_path):
+    """Like send_email_with_attachment, but raises on failure so callers can retry."""
+    # Open CSV file in binary mode
+    with open(csv_file_path, "rb") as attachment:
+        data = attachment.read()
+    deliver_email_with_csv(subject, body, os.path.basename(csv_file_path), data)
+
+def message_with_attachment(to, subject, body, filename, data, mimetype="application/octet-stream"):
+    """A text email from EMAIL_USER with ``data`` (bytes or text) attached as ``filename``."""
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    # Create the email
+    msg = MIMEMultipart()
+    msg['From'] = os.getenv('EMAIL_USER')
+    msg['To'] = to
+    msg['Subject'] = subject
+
+    # Add body to email with UTF-8 encoding
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+
+    part = MIMEBase(*mimetype.split("/", 1))
+    part.set_payload(data)
+
+    # Encode file in ASCII characters to send by email
+    encoders.encode_base64(part)
+
+    # Add header as key/value pair to attachment part
+    part.add_header(
+        "Content-Disposition",
+        f"attachment; filename= {filename}",
+    )
+
+    # Add attachment to message
+    msg.attach(part)
+    return msg
+
+def deliver_email_with_csv(subject, body, filename, data):
+    """Email staff with ``data`` (CSV bytes or text) attached as ``filename``."""
+    sender_email = os.getenv('EMAIL_USER')
+    msg = message_with_attachment(sender_email, subject, body, filename, data)
+
+    # Send the email over a pooled, already-authenticated session
+    get_smtp_pool().send_message(msg, sender_email, [sender_email])
+    print("Email sent successfully.")
+
+def deliver_email_with_pdf(to, subject, body, filename, data):
+    """Send ``to`` a plain-text email with a PDF attached; raises on failure."""
+    sender_email = os.getenv('EMAIL_USER')
+    msg = message_with_attachment(to, subject, body, filename, data, mimetype="application/pdf")
+    get_smtp_pool().send_message(msg, sender_email, [to])
 
 def send_email_with_attachment(subject, body, csv_file_path):
     try:
-        smtp_server = os.getenv('SMTP_SERVER')
-        smtp_port = int(os.getenv('SMTP_PORT'))
-        sender_email = os.getenv('EMAIL_USER')
-        receiver_email = os.getenv('EMAIL_USER')
-        password = os.getenv('EMAIL_PASS')
-
-        # Create the email
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = receiver_email
-        msg['Subject'] = subject
-
-        # Add body to email with UTF-8 encoding
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-        # Open CSV file in binary mode
-        with open(csv_file_path, "rb") as attachment:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(attachment.read())
-
-        # Encode file in ASCII characters to send by email
-        encoders.encode_base64(part)
-
-        # Add header as key/value pair to attachment part
-        part.add_header(
-            "Content-Disposition",
-            f"attachment; filename= {os.path.basename(csv_file_path)}",
-        )
-
-        # Add attachment to message and convert message to string
-        msg.attach(part)
-        text = msg.as_string()
-
-        # Send the email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()  # Secure the connection
-            server.login(sender_email, password)
-            server.sendmail(sender_email, receiver_email, text)
-        print("Email sent successfully.")
+        deliver_email_with_attachment(subject, body, csv_file_path)
     except Exception as e:
-        print(f"Failed to send email: {e}")
\ No newline at end of file
+        print(f"Failed to send email: {e}")
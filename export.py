@@ -0,0 +1,55 @@
+"""
+Encoders for streaming submission exports: rows in, bytes out, a buffer's
+worth at a time, so a download's memory doesn't grow with its size.
+"""
+import io
+import csv
+import json
+import zlib
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+# Flush to the client roughly this often.
+BUFFER_SIZE = 64 * 1024
+
+
+def encode_rows(rows, fmt, headers):
+    """Yield ``rows`` as CSV (with a header line) or NDJSON, in ~BUFFER_SIZE pieces."""
+    buf = io.StringIO(newline="")
+    if fmt == "csv":
+        writer = csv.DictWriter(buf, fieldnames=headers, extrasaction="ignore")
+        writer.writeheader()
+        write = lambda row: writer.writerow({h: row.get(h, "") for h in headers})
+    else:
+        write = lambda row: buf.write(json.dumps({h: row.get(h, "") for h in headers}) + "\n")
+    # The header goes out straight away, so the download starts at once.
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    for row in rows:
+        write(row)
+        if buf.tell() >= BUFFER_SIZE:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip a stream of byte chunks incrementally into a single .gz file."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            # Push the header line out now rather than after 64 KB of input.
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
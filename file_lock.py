@@ -0,0 +1,77 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no advisory locks, single process anyway
+    fcntl = None
+
+
+@contextmanager
+def locked(path, shared=False):
+    """
+    Advisory lock on ``<path>.lock``, shared between processes.
+
+    Appenders take the lock shared, so they never wait on each other; they
+    only wait while a rewrite holds it exclusively. The lock lives in its
+    own file because rewrites replace ``path`` with a new inode.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, encoding="utf-8"):
+    """
+    Write a whole new version of ``path`` into a temp file in the same
+    directory, then ``os.replace`` it in. Readers see the old file or the
+    new one, never a truncated one. Pass ``encoding=None`` to write bytes.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644  # mkstemp's 0600 would hide static files from the web server
+    try:
+        if encoding is None:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", newline="", encoding=encoding)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def append_record(path, data, fsync=False):
+    """
+    Append ``data`` (bytes) with a single O_APPEND write, so concurrent
+    appenders never interleave inside a record. Callers hold ``locked(path,
+    shared=True)`` to stay clear of rewrites. ``fsync=True`` waits until the
+    record is on disk.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import threading
+
+from file_lock import locked, atomic_write
+
+# Longest edge, in pixels, of each responsive variant.
+VARIANT_SIZES = {"thumb": 320, "medium": 800, "full": 1600}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def content_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def process_image(src_path, out_dir, sizes=VARIANT_SIZES):
+    """
+    Decode ``src_path`` once and write WebP and JPEG variants for each size
+    into ``out_dir`` as ``<content-hash>-<size>.<ext>``. EXIF is applied to
+    the pixels (orientation) and then dropped, so no GPS or camera metadata
+    is published. Never upscales. Returns the variant metadata.
+
+    Module-level so it can run in a ProcessPoolExecutor.
+    """
+    from PIL import Image, ImageOps
+
+    digest = content_hash(src_path)
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode in ("RGBA", "LA", "P"):
+            im = im.convert("RGBA")
+            background = Image.new("RGB", im.size, (255, 255, 255))
+            background.paste(im, mask=im.getchannel("A"))
+            im = background
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+        info = {"hash": digest, "width": im.width, "height": im.height, "variants": {}}
+        for name, edge in sorted(sizes.items(), key=lambda item: item[1]):
+            variant = im.copy()
+            variant.thumbnail((edge, edge), Image.LANCZOS)
+            entry = {"width": variant.width, "height": variant.height}
+            for ext, options in (
+                ("webp", {"quality": WEBP_QUALITY, "method": 6}),
+                ("jpeg", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}),
+            ):
+                filename = f"{digest}-{name}.{'jpg' if ext == 'jpeg' else ext}"
+                target = os.path.join(out_dir, filename)
+                if not os.path.exists(target):
+                    # Identical uploads can be processed side by side.
+                    tmp = f"{target}.{os.getpid()}.tmp"
+                    variant.save(tmp, format=ext.upper(), **options)
+                    os.replace(tmp, target)
+                entry[ext] = filename
+            info["variants"][name] = entry
+    return info
+
+
+def picture_sources(info, url, default="medium"):
+    """
+    Template-ready srcsets for a manifest entry. ``url`` turns a variant
+    filename into its public URL. ``full`` is the largest JPEG, for links
+    to the whole photo.
+    """
+    variants = info["variants"]
+    fallback = variants.get(default) or next(iter(variants.values()))
+    # Small originals aren't upscaled, so several sizes can share a width.
+    by_width = {v["width"]: v for v in variants.values()}
+    widths = sorted(by_width)
+    largest = by_width[widths[-1]]
+    return {
+        "src": url(fallback["jpeg"]),
+        "full": url(largest["jpeg"]),
+        "webp_srcset": ", ".join(f"{url(by_width[w]['webp'])} {w}w" for w in widths),
+        "jpeg_srcset": ", ".join(f"{url(by_width[w]['jpeg'])} {w}w" for w in widths),
+        "width": largest["width"],
+        "height": largest["height"],
+    }
+
+
+class VariantManifest:
+    """
+    JSON map of original image name -> variant metadata, shared by all
+    workers. Reads are cached until the file's mtime changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._data = {}
+
+    def load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, encoding="utf-8") as f:
+                    self._data = json.load(f)
+                self._mtime = mtime
+            return self._data
+
+    def get(self, name):
+        return self.load().get(name)
+
+    def version(self):
+        """Changes whenever the manifest does, for keying pages rendered from it."""
+        self.load()
+        return self._mtime
+
+    def update(self, entries, remove=()):
+        """Merge ``entries`` into the manifest (read-modify-write under the lock)."""
+        with locked(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                data = {}
+            data.update(entries)
+            for name in remove:
+                data.pop(name, None)
+            with atomic_write(self.path) as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+        return data
+
+
+class ImagePipeline:
+    """
+    Runs ``process_image`` for uploads in a process pool, off the request
+    thread, and records the results in a manifest as each one finishes.
+    Until then templates show a placeholder. ``on_record`` is
+    called with the image name once its variants are in the manifest.
+    """
+
+    def __init__(self, out_dir, manifest_path, workers=2, on_record=None):
+        self.out_dir = out_dir
+        self.manifest = VariantManifest(manifest_path)
+        self.workers = workers
+        self.on_record = on_record
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, src_path, name=None):
+        name = name or os.path.basename(src_path)
+        future = self._pool().submit(process_image, src_path, self.out_dir)
+        future.add_done_callback(lambda f: self._record(name, f))
+        return future
+
+    def _record(self, name, future):
+        try:
+            self.manifest.update({name: future.result()})
+        except Exception as e:
+            print(f"❌ Image processing failed for {name}: {e}")
+            return
+        if self.on_record:
+            self.on_record(name)
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+"""
+
+
+class MailQueue:
+    """
+    Durable outbound mail queue backed by SQLite.
+
+    ``enqueue()`` commits the message and returns straight away; worker
+    threads pick up due messages, hand them to the handler registered for
+    their ``kind`` and retry failures with exponential backoff. Several
+    processes can share one queue file: a message is claimed for
+    ``claim_timeout`` seconds before it is sent, so only one worker sends it.
+    """
+
+    def __init__(self, db_path, handlers=None, workers=2, max_attempts=8,
+                 base_delay=15, max_delay=3600, poll_interval=5, claim_timeout=300):
+        self.db_path = db_path
+        self.handlers = dict(handlers or {})
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    # -- producer ----------------------------------------------------------
+
+    def enqueue(self, kind, **payload):
+        """Durably record a message for background delivery; returns its id."""
+        if kind not in self.handlers:
+            raise ValueError(f"No mail handler registered for {kind!r}")
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (kind, payload, next_attempt, created) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), now, now),
+            )
+            message_id = cur.lastrowid
+        self.start()
+        self._wakeup.set()
+        return message_id
+
+    # -- workers -----------------------------------------------------------
+
+    def start(self):
+        """Start worker threads once per process (safe after a fork)."""
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._stopping.clear()
+            for n in range(self.workers):
+                threading.Thread(target=self._run, name=f"mail-queue-{n}", daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+        self._started_pid = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                if self.process_one():
+                    continue
+            except sqlite3.Error as e:
+                print(f"❌ Mail queue error: {e}")
+            self._wakeup.wait(self.poll_interval)
+
+    def _claim(self):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt <= ? AND claimed_until <= ? "
+                "ORDER BY next_attempt LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            cur = conn.execute(
+                "UPDATE outbox SET claimed_until = ? WHERE id = ? AND claimed_until <= ?",
+                (now + self.claim_timeout, row[0], now),
+            )
+            if cur.rowcount != 1:
+                return None  # another worker got there first
+        return row
+
+    def process_one(self):
+        """Send one due message. Returns False when nothing was due."""
+        claimed = self._claim()
+        if claimed is None:
+            return False
+        message_id, kind, payload, attempts = claimed
+        try:
+            self.handlers[kind](**json.loads(payload))
+        except Exception as e:
+            self._failed(message_id, attempts + 1, e)
+        else:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+        return True
+
+    def _failed(self, message_id, attempts, error):
+        if attempts >= self.max_attempts:
+            status, next_attempt = "dead", time.time()
+            print(f"❌ Giving up on queued email {message_id} after {attempts} attempts: {error}")
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            status, next_attempt = "pending", time.time() + delay * random.uniform(0.8, 1.2)
+            print(f"❌ Queued email {message_id} failed (attempt {attempts}), retrying in {delay}s: {error}")
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, status = ?, next_attempt = ?, claimed_until = 0, last_error = ? "
+                "WHERE id = ?",
+                (attempts, status, next_attempt, str(error), message_id),
+            )
+
+    def drain(self, timeout=30):
+        """Send everything that is due now; handy for scripts and tests."""
+        deadline = time.time() + timeout
+        while time.time() < deadline and self.process_one():
+            pass
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
@@ -0,0 +1,188 @@
+import os
+import time
+import pickle
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import request, session, make_response, Response
+
+from file_lock import atomic_write
+
+
+class MemoryBackend:
+    """Per-process LRU, bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] <= time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += len(entry["body"])
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self._bytes -= len(self._entries.pop(key)["body"])
+
+    def invalidate(self, path=None):
+        with self._lock:
+            for key in [k for k in self._entries if path is None or k[1] == path]:
+                self._drop(key)
+
+
+class DiskBackend:
+    """
+    Entries pickled under ``directory``, one subdirectory per route, so every
+    worker process shares hits and invalidations. Oldest files are pruned
+    once there are more than ``max_entries``.
+    """
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, self._digest(key[1])[:16], self._digest(key))
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if entry["expires"] <= time.time() or entry["key"] != key:
+            return None
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path, encoding=None) as f:
+            pickle.dump(dict(entry, key=key), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self.prune()
+
+    def _files(self, path=None):
+        dirs = [self._digest(path)[:16]] if path is not None else os.listdir(self.directory)
+        for name in dirs:
+            subdir = os.path.join(self.directory, name)
+            if not os.path.isdir(subdir):
+                continue
+            for filename in os.listdir(subdir):
+                if not filename.endswith(".tmp"):
+                    yield os.path.join(subdir, filename)
+
+    def prune(self):
+        files = []
+        for path in self._files():
+            try:
+                files.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                pass
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_entries)]:
+            _remove_quietly(path)
+
+    def invalidate(self, path=None):
+        for filename in list(self._files(path)):
+            _remove_quietly(filename)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _personalised():
+    """Logged-in or mid-flash requests always get a freshly rendered page."""
+    return bool(session.get("logged_in") or session.get("user_id") or session.get("_flashes"))
+
+
+class PageCache:
+    """
+    Whole-response cache for pages that render the same for every anonymous
+    visitor. Keyed on host, path and sorted query string; entries live for
+    ``ttl`` seconds unless ``invalidate()`` drops them sooner. Responses
+    carry an ETag and revalidate with 304s.
+    """
+
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(req):
+        return (req.host, req.path, urlencode(sorted(req.args.items(multi=True))))
+
+    def invalidate(self, path=None):
+        """Drop every cached page, or just the variants of one path."""
+        self.backend.invalidate(path)
+
+    def cached(self, ttl=None):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method not in ("GET", "HEAD") or _personalised():
+                    return view(*args, **kwargs)
+                key = self.key_for(request)
+                entry = self.backend.get(key)
+                if entry is None:
+                    self.misses += 1
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+                        return response
+                    body = response.get_data()
+                    entry = {
+                        "body": body,
+                        "content_type": response.content_type,
+                        "etag": hashlib.sha1(body).hexdigest(),
+                        "expires": time.time() + (self.ttl if ttl is None else ttl),
+                    }
+                    self.backend.set(key, entry)
+                else:
+                    self.hits += 1
+                response = Response(entry["body"], content_type=entry["content_type"])
+                response.set_etag(entry["etag"])
+                response.cache_control.public = True
+                response.cache_control.no_cache = True  # revalidate, so invalidation reaches browsers
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+def open_page_cache(backend, directory, ttl=300):
+    if backend == "disk":
+        return PageCache(DiskBackend(directory), ttl=ttl)
+    return PageCache(MemoryBackend(), ttl=ttl)
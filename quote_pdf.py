@@ -0,0 +1,172 @@
+import io
+import os
+import glob
+import json
+import hashlib
+import threading
+
+from file_lock import atomic_write
+from submission_index import status_bucket
+
+# Everything the PDF shows. A change to any of these (or to the layout
+# version) gives the submission a new content hash, so a new PDF.
+PDF_FIELDS = ("id", "Timestamp", "Name", "Email", "Phone", "Car", "Vehicle Type", "Services", "Total", "Status")
+LAYOUT_VERSION = 1
+
+SHOP_NAME = "DS Auto Care"
+
+
+def content_hash(row):
+    payload = json.dumps([LAYOUT_VERSION] + [row.get(f) or "" for f in PDF_FIELDS])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def document_title(row):
+    return "Invoice" if status_bucket(row.get("Status")) == "completed" else "Quote"
+
+
+def render_pdf(row):
+    """
+    Lay out a one-page quote (or, once the job is completed, invoice) for a
+    submission row and return the PDF bytes. ``invariant`` keeps reportlab
+    from stamping the creation time, so the same row always renders to the
+    same bytes.
+
+    Module-level so it can run in a ProcessPoolExecutor.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    title = document_title(row)
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=letter, invariant=1)
+    pdf.setTitle(f"{SHOP_NAME} {title} {row['id'][:8].upper()}")
+    width, height = letter
+    left, right, y = 54, width - 54, height - 72
+
+    pdf.setFont("Helvetica-Bold", 20)
+    pdf.drawString(left, y, SHOP_NAME)
+    pdf.drawRightString(right, y, title)
+    y -= 20
+    pdf.setFont("Helvetica", 10)
+    pdf.drawRightString(right, y, f"No. {row['id'][:8].upper()}")
+    pdf.drawString(left, y, f"Date: {(row.get('Timestamp') or '')[:10]}")
+    y -= 36
+
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(left, y, "Customer")
+    pdf.drawString(width / 2, y, "Vehicle")
+    pdf.setFont("Helvetica", 10)
+    for customer, vehicle in zip(
+        (row.get("Name"), row.get("Email"), row.get("Phone")),
+        (row.get("Car"), row.get("Vehicle Type"), ""),
+    ):
+        y -= 15
+        pdf.drawString(left, y, customer or "")
+        pdf.drawString(width / 2, y, vehicle or "")
+    y -= 36
+
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(left, y, "Services")
+    y -= 6
+    pdf.line(left, y, right, y)
+    pdf.setFont("Helvetica", 10)
+    services = [s.strip() for s in (row.get("Services") or "").split(",") if s.strip()] or ["—"]
+    for service in services:
+        y -= 16
+        if y < 120:
+            pdf.showPage()
+            pdf.setFont("Helvetica", 10)
+            y = height - 72
+        pdf.drawString(left + 8, y, service)
+    y -= 12
+    pdf.line(left, y, right, y)
+    y -= 20
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(left, y, "Total" if title == "Invoice" else "Estimated total")
+    pdf.drawRightString(right, y, f"${row.get('Total') or '0'}")
+
+    pdf.setFont("Helvetica", 9)
+    pdf.drawString(left, 72, "Thank you for your business!" if title == "Invoice"
+                   else "Estimate only; the final price is confirmed at your appointment.")
+    pdf.showPage()
+    pdf.save()
+    return buf.getvalue()
+
+
+class QuotePDFs:
+    """
+    Quote/invoice PDFs rendered in a process pool and cached on disk as
+    ``<id>-<content hash>.pdf``. The hash doubles as the ETag, so repeat
+    downloads and email attachments reuse the same bytes; a row that changes
+    gets a new file and the old one is removed.
+    """
+
+    def __init__(self, cache_dir, workers=1, timeout=30):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._inflight = {}  # path -> Future, so one render serves concurrent callers
+        self._stats = {"hits": 0, "renders": 0}
+
+    def _pool(self):
+        if self._executor is None or self._pid != os.getpid():
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def path_for(self, row):
+        digest = content_hash(row)
+        return os.path.join(self.cache_dir, f"{row['id']}-{digest}.pdf"), digest
+
+    def get(self, row):
+        """(path, etag) of the PDF for ``row``, rendering it on a miss."""
+        path, digest = self.path_for(row)
+        if os.path.exists(path):
+            with self._lock:
+                self._stats["hits"] += 1
+            return path, digest
+        with self._lock:
+            future = self._inflight.get(path)
+            owner = future is None
+            if owner:
+                future = self._pool().submit(render_pdf, {f: row.get(f) or "" for f in PDF_FIELDS})
+                self._inflight[path] = future
+                self._stats["renders"] += 1
+        try:
+            data = future.result(timeout=self.timeout)
+            # Every waiter writes if the file isn't there yet, so none can
+            # return before it exists; the bytes are identical anyway.
+            if not os.path.exists(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with atomic_write(path, encoding=None) as f:
+                    f.write(data)
+            if owner:
+                self._remove_stale(row["id"], path)
+        finally:
+            if owner:
+                with self._lock:
+                    self._inflight.pop(path, None)
+        return path, digest
+
+    def read(self, row):
+        """(bytes, etag), e.g. for an email attachment."""
+        path, digest = self.get(row)
+        with open(path, "rb") as f:
+            return f.read(), digest
+
+    def _remove_stale(self, submission_id, keep):
+        for old in glob.glob(os.path.join(glob.escape(self.cache_dir), f"{glob.escape(submission_id)}-*.pdf")):
+            if old != keep:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,138 @@
+"""
+Token-bucket rate limiting for the public form posts.
+
+Each (scope, key) pair, e.g. ("send_email_ip", "203.0.113.7"), gets a bucket
+of ``capacity`` tokens refilled at ``capacity / per`` tokens a second; a post
+spends one. ``MemoryBackend`` keeps buckets per process; ``SqliteBackend``
+keeps them in one small SQLite file (put it on /dev/shm for a RAM-backed
+store) so every worker shares the same limits.
+"""
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, Counter
+
+
+def parse_rate(spec):
+    """Parse "5/600" (five posts, refilled over 600 seconds) into (5, 600.0)."""
+    count, _, per = str(spec).partition("/")
+    return int(count), float(per or 60)
+
+
+def _spend(tokens, updated, now, capacity, per):
+    """Refill since ``updated`` and try to spend a token: (allowed, tokens, retry_after)."""
+    tokens = min(capacity, tokens + (now - updated) * capacity / per)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) * per / capacity
+
+
+class MemoryBackend:
+    """Buckets in this process; the least recently used are dropped past ``max_keys``."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, per):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            allowed, tokens, retry_after = _spend(tokens, updated, now, capacity, per)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class SqliteBackend:
+    """Buckets shared by every worker through a WAL-mode SQLite file."""
+
+    # Delete buckets untouched for this long (they'd be full again anyway).
+    PRUNE_AFTER = 86400
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._takes = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # losing a bucket on power loss is harmless
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, per):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            allowed, tokens, retry_after = _spend(tokens, updated, now, capacity, per)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.PRUNE_AFTER,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """
+    Named limits over one backend, plus counters for what was let through,
+    limited or shed (rejected as junk before any real work), for /metrics.
+    """
+
+    def __init__(self, backend, limits=None):
+        self.backend = backend
+        self.limits = dict(limits or {})  # scope -> (capacity, per)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def check(self, scope, key):
+        """Spend a token from ``scope``'s bucket for ``key``: (allowed, retry_after seconds)."""
+        capacity, per = self.limits[scope]
+        if not key or capacity <= 0:
+            return True, 0.0
+        try:
+            allowed, retry_after = self.backend.take(f"{scope}:{key}", capacity, per)
+        except sqlite3.Error as e:
+            # A busy or broken limiter must not take the forms down with it.
+            print(f"❌ Rate limiter unavailable ({scope}): {e}")
+            return True, 0.0
+        self._count(f"allowed_{scope}" if allowed else f"limited_{scope}")
+        return allowed, retry_after
+
+    def shed(self, reason):
+        self._count(f"shed_{reason}")
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def open_rate_limiter(backend, db_path, limits):
+    if backend == "sqlite":
+        return RateLimiter(SqliteBackend(db_path), limits)
+    return RateLimiter(MemoryBackend(), limits)
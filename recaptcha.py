@@ -0,0 +1,182 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+
+DEFAULT_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
+
+
+class CaptchaUnavailable(RuntimeError):
+    """Verification couldn't be completed (upstream down, slow or breaker open)."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and fails fast for
+    ``reset_timeout`` seconds; then lets a single trial call through
+    (half-open) and closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class RecaptchaVerifier:
+    """
+    siteverify client on a keep-alive ``requests.Session``.
+
+    Results are cached per token for ``cache_ttl`` seconds (Google rejects a
+    token the second time it's verified, so a double-submit would otherwise
+    fail), and concurrent checks of the same token share one upstream call.
+    ``url`` can point at a local stub for testing.
+    """
+
+    def __init__(self, secret, url=DEFAULT_VERIFY_URL, timeout=(2, 3), pool_size=4,
+                 cache_ttl=120, cache_size=1024, breaker=None):
+        self.secret = secret
+        self.url = url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._cache = OrderedDict()  # token hash -> (expires, result)
+        self._inflight = {}  # token hash -> Event
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"requests": 0, "errors": 0, "cache_hits": 0, "short_circuits": 0, "passed": 0, "rejected": 0}
+
+    def _get_session(self):
+        # Imported on first use: requests costs more to import than the
+        # rest of a worker's startup outside Flask.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session, self._pid = session, os.getpid()
+            return self._session
+
+    def verify(self, token, remote_ip=None):
+        """True/False for the token; raises CaptchaUnavailable if we can't tell."""
+        if not token:
+            return False
+        key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        while True:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached and cached[0] > time.monotonic():
+                    self._stats["cache_hits"] += 1
+                    return cached[1]
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            # Someone else is verifying this token; wait for their answer.
+            if not event.wait(self._total_timeout()):
+                raise CaptchaUnavailable("reCAPTCHA verification timed out")
+            with self._lock:
+                if key not in self._cache:
+                    raise CaptchaUnavailable("reCAPTCHA verification failed")
+        try:
+            result = self._call(token, remote_ip)
+            with self._lock:
+                self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self._stats["passed" if result else "rejected"] += 1
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _total_timeout(self):
+        return sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+
+    def _call(self, token, remote_ip):
+        if not self.breaker.allow():
+            with self._lock:
+                self._stats["short_circuits"] += 1
+            raise CaptchaUnavailable("reCAPTCHA verification is temporarily unavailable")
+        data = {"secret": self.secret, "response": token}
+        if remote_ip:
+            data["remoteip"] = remote_ip
+        succeeded = False
+        try:
+            from requests import RequestException
+            session = self._get_session()
+            start = time.perf_counter()
+            try:
+                resp = session.post(self.url, data=data, timeout=self.timeout)
+                resp.raise_for_status()
+                result = bool(resp.json().get("success"))
+            except (RequestException, ValueError) as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise CaptchaUnavailable(str(e)) from e
+            finally:
+                with self._lock:
+                    self._stats["requests"] += 1
+                    self._latencies.append(time.perf_counter() - start)
+            succeeded = True
+        finally:
+            # Whatever went wrong counts as a failure; either way a
+            # half-open trial is over, so the breaker isn't left stuck.
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        return result
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        stats["breaker"] = self.breaker.state
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[f"latency_{name}_ms"] = round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else None
+        return stats
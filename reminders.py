@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Email owners whose cars are due for a service.
+
+Meant to run as a scheduled task (e.g. daily on PythonAnywhere):
+
+    python reminders.py [--dry-run] [--today YYYY-MM-DD]
+
+A service is due once ``recommended_interval`` days have passed since its
+``last_service_date``. Owners who opted in (``users.wants_email_reminders``)
+get one email per run listing every due service across their cars, and
+``services.last_reminded_date`` is stamped so the same service cycle is
+never reminded twice. Logging a new service (a later ``last_service_date``)
+starts the next cycle.
+
+Due services come from a single query served by a partial expression index
+that only holds not-yet-reminded rows, so a run costs the number of due
+services, not the size of the garage. Emails go out in batches over one
+pooled SMTP session, paced to REMINDER_RATE per second, and each batch's
+services are stamped in one transaction straight after it is sent: a crash
+can repeat at most one batch, and a rerun picks up where the last one
+stopped. Services whose owner's address the server refuses are stamped too,
+so a dead address isn't retried on every run ahead of the deliverable ones.
+"""
+import os
+import time
+import smtplib
+import sqlite3
+import argparse
+from datetime import date, datetime
+from itertools import groupby
+
+from dotenv import load_dotenv
+
+from file_lock import locked
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# A scheduled task doesn't get the web app's environment; read its .env.
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(BASE_DIR, "site.db"))
+BATCH_SIZE = int(os.getenv("REMINDER_BATCH", 100))
+RATE = float(os.getenv("REMINDER_RATE", 5))  # emails per second
+
+REMINDER_TYPE = "service_email"
+
+DUE_DATE = "date(s.last_service_date, '+' || s.recommended_interval || ' days')"
+PENDING = f"(s.last_reminded_date IS NULL OR s.last_reminded_date < {DUE_DATE})"
+
+# Columns added to site.db after it was first created (see schema.sql).
+COLUMNS = {
+    "users": [
+        ("wants_email_reminders", "INTEGER DEFAULT 0"),
+        ("wants_text_reminders", "INTEGER DEFAULT 0"),
+        ("phone_number", "TEXT"),
+    ],
+    "services": [("last_reminded_date", "TEXT")],
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS user_reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    reminder_type TEXT NOT NULL,
+    last_triggered TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_reminders_type ON user_reminders (user_id, reminder_type);
+CREATE INDEX IF NOT EXISTS idx_cars_owner ON cars (owner_id);
+CREATE INDEX IF NOT EXISTS idx_services_pending ON services ({DUE_DATE.replace("s.", "")})
+    WHERE {PENDING.replace("s.", "")};
+"""
+
+DUE_QUERY = f"""
+SELECT u.id, u.name, u.email, s.id, s.service_type, s.last_service_date, {DUE_DATE},
+       c.year, c.make, c.model
+FROM services s
+JOIN cars c ON c.vin = s.vin
+JOIN users u ON u.id = c.owner_id
+WHERE {DUE_DATE} <= ? AND {PENDING}
+  AND u.wants_email_reminders = 1 AND u.email != ''
+ORDER BY u.id, {DUE_DATE}
+"""
+
+
+def connect(db_path=SQLITE_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    migrate(conn)
+    return conn
+
+
+def migrate(conn):
+    """Add the reminder columns and indexes if this database predates them."""
+    with conn:
+        for table, columns in COLUMNS.items():
+            existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+            for name, decl in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+        conn.executescript(SCHEMA)
+
+
+def due_reminders(conn, today):
+    """Due services grouped per owner: [(user_id, name, email, [service, ...]), ...]."""
+    rows = conn.execute(DUE_QUERY, (today,)).fetchall()
+    grouped = []
+    for (user_id, name, email), services in groupby(rows, key=lambda r: r[:3]):
+        grouped.append((user_id, name, email, [
+            {"id": r[3], "type": r[4], "last": r[5], "due": r[6], "car": f"{r[7]} {r[8]} {r[9]}"}
+            for r in services
+        ]))
+    return grouped
+
+
+def reminder_body(name, services):
+    lines = "\n".join(
+        f"- {s['car']}: {s['type']} (last done {s['last']}, due {s['due']})" for s in services
+    )
+    return f"""Hi {name or 'there'},
+
+It's time to book the following service{'s' if len(services) > 1 else ''}:
+
+{lines}
+
+Reply to this email or request a quote on our website and we'll get you scheduled.
+
+— DS Auto Care
+"""
+
+
+def mark_sent(conn, sent, today, refused=()):
+    """
+    Stamp one batch's services and owners in a single transaction. Refused
+    services are stamped as well, which takes them out of this cycle, but
+    their owners aren't recorded as reminded.
+    """
+    if not (sent or refused):
+        return
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with conn:
+        conn.executemany(
+            "UPDATE services SET last_reminded_date = ? WHERE id = ?",
+            [(today, s["id"]) for _, services in list(sent) + list(refused) for s in services],
+        )
+        conn.executemany(
+            "INSERT INTO user_reminders (user_id, reminder_type, last_triggered) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, reminder_type) DO UPDATE SET last_triggered = excluded.last_triggered",
+            [(user_id, REMINDER_TYPE, now) for user_id, _ in sent],
+        )
+
+
+def send_batch(pool, batch, rate):
+    """
+    Send one batch over a single pooled session. Returns what went out,
+    what the server refused, and whether the session survived the batch.
+    """
+    from email_service import text_message
+
+    sent, refused = [], []
+    interval = 1.0 / rate if rate > 0 else 0
+    next_at = time.monotonic()
+    try:
+        with pool.connection() as conn:
+            for user_id, name, email, services in batch:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at = time.monotonic() + interval
+                msg = text_message(email, "Your car is due for service", reminder_body(name, services))
+                try:
+                    conn.send_message(msg, msg["From"], [email])
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                    # This address is refused; the session is still fine.
+                    print(f"❌ Reminder to {email} refused: {e}")
+                    refused.append((user_id, services))
+                    continue
+                sent.append((user_id, services))
+    except (smtplib.SMTPException, OSError) as e:
+        # Lost the session: keep what was sent, the rest waits for next run.
+        print(f"❌ Reminder batch stopped after {len(sent)} emails: {e}")
+        return sent, refused, False
+    return sent, refused, True
+
+
+def run(db_path=SQLITE_PATH, today=None, dry_run=False, batch_size=BATCH_SIZE, rate=RATE, pool=None):
+    today = today or date.today().isoformat()
+    # One scheduler at a time; a second run waits, then finds nothing left.
+    with locked(db_path + ".reminders"):
+        conn = connect(db_path)
+        try:
+            due = due_reminders(conn, today)
+            services = sum(len(s) for *_, s in due)
+            print(f"{services} services due for {len(due)} owners as of {today}")
+            if dry_run or not due:
+                return 0
+            if pool is None:
+                # Imported here so --dry-run works without SMTP settings.
+                from email_service import get_smtp_pool
+                pool = get_smtp_pool()
+            total = 0
+            for start in range(0, len(due), batch_size):
+                batch = due[start:start + batch_size]
+                sent, refused, ok = send_batch(pool, batch, rate)
+                mark_sent(conn, sent, today, refused)
+                total += len(sent)
+                if not ok:
+                    break
+            print(f"✅ Sent {total} service reminders")
+            return total
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=SQLITE_PATH)
+    parser.add_argument("--today", help="treat this YYYY-MM-DD as today")
+    parser.add_argument("--dry-run", action="store_true", help="count due reminders without sending")
+    args = parser.parse_args()
+    run(args.db, today=args.today, dry_run=args.dry_run)
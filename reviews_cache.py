@@ -0,0 +1,73 @@
+import random
+import threading
+from collections import namedtuple, OrderedDict
+
+from storage import TESTIMONIAL_FIELDS
+
+# Tuples are a fraction of the size of the csv module's dicts, and Jinja
+# resolves both review.name and review['name'] on them.
+Review = namedtuple("Review", TESTIMONIAL_FIELDS)
+
+
+class ReviewsCache:
+    """
+    Parsed testimonials, reloaded only when the testimonial store changes.
+
+    The homepage shows ``k`` random reviews. Rather than sampling (and
+    rendering) a fresh set per hit, a rotation of ``rotation`` random
+    selections is drawn once per data version; each hit picks one of those,
+    and the rendered page for each selection is kept in a small LRU.
+    """
+
+    def __init__(self, store, k=3, rotation=24, max_pages=64):
+        self.store = store
+        self.k = k
+        self.rotation = rotation
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self._sig = object()
+        self._reviews = ()
+        self._selections = ()
+        self._pages = OrderedDict()
+
+    def _check(self):
+        sig = self.store.refresh()
+        if sig == self._sig:
+            return
+        with self._lock:
+            if sig == self._sig:
+                return
+            reviews = tuple(Review(**{f: row.get(f) or "" for f in TESTIMONIAL_FIELDS}) for row in self.store.rows())
+            k = min(self.k, len(reviews))
+            # random.sample over a range is O(k), whatever the review count.
+            self._selections = tuple(
+                tuple(sorted(random.sample(range(len(reviews)), k))) for _ in range(self.rotation)
+            ) if reviews else ((),)
+            self._reviews = reviews
+            self._pages.clear()
+            self._sig = sig
+
+    def all(self):
+        self._check()
+        return self._reviews
+
+    def featured(self):
+        """Return (selection_key, reviews) for one pre-drawn random selection."""
+        self._check()
+        reviews, selections, sig = self._reviews, self._selections, self._sig
+        key = random.choice(selections)
+        return (sig, key), [reviews[i] for i in key]
+
+    def render(self, key, render):
+        """Cache ``render()``'s output for a selection key from ``featured()``."""
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+        page = render()
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return page
@@ -114,4 +114,7 @@ ALTER TABLE users ADD COLUMN owner_social TEXT;
 ALTER TABLE cars ADD COLUMN horsepower INTEGER;
 ALTER TABLE cars ADD COLUMN torque INTEGER;
 ALTER TABLE cars ADD COLUMN weight INTEGER;
-ALTER TABLE cars ADD COLUMN zip_code TEXT;
\ No newline at end of file
+ALTER TABLE cars ADD COLUMN zip_code TEXT;
+
+-- The submissions, testimonials and store_meta tables are created by
+-- storage.py (SQLITE_SCHEMA) the first time the SQLite backend opens site.db.
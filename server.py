@@ -1,21 +1,22 @@
 import os
+import mimetypes
+import time
+import hmac
 import csv
-import base64
 import uuid
-import random
-import smtplib
-import requests
-from flask import Flask, request, redirect, url_for, render_template, session, abort, flash, Response, g
+from flask import Flask, request, redirect, url_for, render_template, session, abort, flash, Response, g, jsonify, stream_template, stream_with_context, send_from_directory, send_file
 from functools import wraps
-from datetime import datetime, timedelta
-from io import BytesIO
+from datetime import datetime
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
-from email.mime.text import MIMEText
-from flask_mail import Mail, Message
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 from decimal import Decimal, InvalidOperation
 
+# Load environment variables before anything below reads them: on
+# PythonAnywhere .env is the only place the settings live.
+env_path = os.path.join(os.path.dirname(__file__), '.env')
+load_dotenv(dotenv_path=env_path)
 
 # Google API imports (commented out if not used; uncomment if needed)
 # from google.oauth2.credentials import Credentials
@@ -23,18 +24,41 @@ from decimal import Decimal, InvalidOperation
 # from google.auth.transport.requests import Request
 # from googleapiclient.discovery import build
 
-# Database
-import pymysql
-from pymysql.err import OperationalError, IntegrityError
-
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-
-from email_service import send_email_with_attachment
+# pymysql, requests (reCAPTCHA) and smtplib (email_service) are imported
+# where they're first used, so a freshly recycled worker serving the
+# homepage never loads them. `python startup_benchmark.py` checks this.
+
+from email_service import deliver_email, deliver_email_with_attachment, deliver_email_with_csv, deliver_email_with_pdf, required_vars as SMTP_REQUIRED_VARS
+from mail_queue import MailQueue
+from db_pool import ConnectionPool
+from submission_store import HEADERS, rows_to_csv
+from submission_index import SORT_KEYS
+from export import FORMATS as EXPORT_FORMATS, encode_rows, gzip_stream
+from storage import open_submission_store, open_testimonial_store, TESTIMONIAL_FIELDS
+from reviews_cache import ReviewsCache
+from image_pipeline import ImagePipeline, VariantManifest, picture_sources
+from quote_pdf import QuotePDFs, document_title
+from static_assets import AssetVersions, IMMUTABLE
+from page_cache import open_page_cache
+from metrics import registry, REQUEST_LATENCY, span, timed
+from recaptcha import RecaptchaVerifier, CircuitBreaker, CaptchaUnavailable, DEFAULT_VERIFY_URL
+from rate_limit import open_rate_limiter, parse_rate
+from compression import (
+    COMPRESSIBLE_EXTENSIONS, PRECOMPRESSED, MIN_SIZE, CompressedCache,
+    available_encodings, is_compressible, negotiate,
+)
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']  # If using Gmail API
 
 app = Flask(__name__)
+# Behind a reverse proxy request.remote_addr is the proxy's address for every
+# visitor. PROXY_HOPS trusts that many X-Forwarded-* hops so remote_addr,
+# which the rate limits and reCAPTCHA's remoteip use, is the client's address;
+# set it in .env (1 on PythonAnywhere). Off by default: without a proxy in
+# front, anyone could pick their own address with the header.
+PROXY_HOPS = int(os.getenv("PROXY_HOPS", 0))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
 
 # Configuration
 DATA_PATH = os.path.join(app.root_path, 'database.csv')
@@ -43,58 +67,133 @@ TESTIMONIALS_CSV = os.path.join(os.path.dirname(__file__), "testimonials.csv")
 REVIEWS_CSV = "testimonials.csv"
 DATA_CSV = os.path.join(os.path.dirname(__file__), "database.csv")
 
-HEADERS = [
-    "id",
-    "Timestamp",
-    "Name",
-    "Email",
-    "Car",
-    "Phone",
-    "Is Mobile",
-    "Contact Method",
-    "Best Time to Call",
-    "Preferred Appointment Time",
-    "Message",
-    "Vehicle Type",
-    "Services",
-    "Total",
-    "Status",
-]
-
-CSV_FIELDS = [
-    'name',
-    'car',
-    'date',
-    'testimonial',
-    'before',
-    'after',
-    'service_type'
-]
-
-UPLOAD_FOLDER = os.path.join(app.root_path, 'static/uploads')
+# Submissions and testimonials live in CSV files by default; set
+# STORAGE_BACKEND=sqlite (after `python storage.py migrate`) to use site.db.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(app.root_path, "site.db"))
+store = open_submission_store(STORAGE_BACKEND, CSV_PATH, SQLITE_PATH)
+testimonial_store = open_testimonial_store(STORAGE_BACKEND, TESTIMONIALS_CSV, SQLITE_PATH)
+reviews_cache = ReviewsCache(testimonial_store)
+
+CSV_FIELDS = TESTIMONIAL_FIELDS
+
+# Uploaded photos are kept outside static/, so an original, with whatever
+# EXIF/GPS data the camera put in it, can never be fetched.
+UPLOAD_FOLDER = os.path.join(app.root_path, 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+
+# Testimonial photos are resized/recompressed in the background, metadata
+# dropped; templates serve those variants once they're in the manifest and a
+# placeholder until then. The homepage keys its rendered pages on the
+# manifest version; /reviews.json is dropped here.
+VARIANTS_FOLDER = os.path.join(app.root_path, 'static/uploads/variants')
+PHOTO_PENDING = 'assets/photo-pending.svg'
+image_pipeline = ImagePipeline(
+    VARIANTS_FOLDER, os.path.join(VARIANTS_FOLDER, 'manifest.json'),
+    on_record=lambda name: page_cache.invalidate("/reviews.json"),
+)
+# Gallery images are built offline by build_images.py.
+gallery_manifest = VariantManifest(os.path.join(app.root_path, 'static/images/optimized/manifest.json'))
+
+# Quote/invoice PDFs are rendered by reportlab in a process pool and kept on
+# disk per content hash; downloads and auto-reply attachments share them.
+quote_pdfs = QuotePDFs(
+    os.getenv("QUOTE_PDF_DIR", os.path.join(app.root_path, "quote_pdfs")),
+    workers=int(os.getenv("PDF_WORKERS", 1)),
+)
+
 app.config['MAX_CONTENT_LENGTH'] = 3 * 1024 * 1024  # 3 MB limit
 
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+# CSS/JS under static/assets get a ?v=<content hash> on every url_for() and
+# are cached for a year; other static files revalidate after STATIC_MAX_AGE
+# seconds via ETag/Last-Modified.
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.getenv("STATIC_MAX_AGE", 3600))
+asset_versions = AssetVersions(app.static_folder)
+asset_versions.manifest()  # hash everything once at startup
+# Image variants are named by content hash, so they never change either.
+CONTENT_ADDRESSED = ("images/optimized/", "uploads/variants/")
+
+# HTML/JSON responses are gzip/brotli-compressed once per distinct body;
+# static text files are served from the .gz/.br siblings compress_assets.py
+# writes, when they're at least as new as the original.
+compressed_cache = CompressedCache(max_entries=int(os.getenv("COMPRESSED_CACHE_SIZE", 128)))
+
+# Rendered pages that are the same for every anonymous visitor.
+# PAGE_CACHE_BACKEND=disk shares them between worker processes.
+page_cache = open_page_cache(
+    os.getenv("PAGE_CACHE_BACKEND", "memory").strip().lower(),
+    os.getenv("PAGE_CACHE_DIR", os.path.join(app.root_path, "page_cache")),
+    ttl=int(os.getenv("PAGE_CACHE_TTL", 300)),
+)
 
-# Load environment variables
-env_path = os.path.join(os.path.dirname(__file__), '.env')
-load_dotenv(dotenv_path=env_path)
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
 app.secret_key = os.getenv('SECRET_KEY', 'your-default-key')
 
-# Flask-Mail configuration (kept for auto-replies, etc.)
-app.config.update(
-    MAIL_SERVER=os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
-    MAIL_PORT=int(os.getenv('SMTP_PORT', 587)),
-    MAIL_USE_TLS=True,
-    MAIL_USERNAME=os.getenv('EMAIL_USER'),
-    MAIL_PASSWORD=os.getenv('EMAIL_PASS'),
-    MAIL_DEFAULT_SENDER=os.getenv('EMAIL_USER')
+# One keep-alive session for siteverify; after RECAPTCHA_FAILURES errors in a
+# row, submissions fail fast for RECAPTCHA_RESET seconds instead of waiting.
+recaptcha = RecaptchaVerifier(
+    os.getenv("RECAPTCHA_SECRET_KEY", ""),
+    url=os.getenv("RECAPTCHA_VERIFY_URL", DEFAULT_VERIFY_URL),
+    timeout=(2, float(os.getenv("RECAPTCHA_TIMEOUT", 3))),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("RECAPTCHA_FAILURES", 5)),
+        reset_timeout=int(os.getenv("RECAPTCHA_RESET", 30)),
+    ),
+)
+
+# Public form posts are limited per IP and per email address (token buckets:
+# "5/600" is a burst of 5, refilled over 600 s) before any reCAPTCHA, storage
+# or SMTP work. RATE_LIMIT_BACKEND=sqlite shares the buckets between workers
+# through RATE_LIMIT_DB, which can live on /dev/shm.
+rate_limiter = open_rate_limiter(
+    os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower(),
+    os.getenv("RATE_LIMIT_DB", os.path.join(app.root_path, "rate_limit.db")),
+    {
+        "send_email_ip": parse_rate(os.getenv("SEND_EMAIL_RATE_IP", "5/600")),
+        "send_email_address": parse_rate(os.getenv("SEND_EMAIL_RATE_EMAIL", "3/3600")),
+        "testimonial_ip": parse_rate(os.getenv("TESTIMONIAL_RATE_IP", "3/3600")),
+    },
 )
 
-mail = Mail(app)
+# Mail goes out through email_service's shared SMTP connection pool, which
+# checks its settings on first send; flag missing ones at startup too.
+_missing_smtp = [var for var in SMTP_REQUIRED_VARS if not os.getenv(var)]
+if _missing_smtp:
+    print(f"❌ Missing SMTP settings ({', '.join(_missing_smtp)}); outgoing mail will fail")
+
+# Outbound mail is queued and sent by background threads so form posts
+# don't wait on SMTP. The queue file is shared by all workers.
+MAIL_QUEUE_DB = os.getenv("MAIL_QUEUE_DB", os.path.join(app.root_path, "mail_queue.db"))
+
+def quote_filename(row):
+    return f"{document_title(row).lower()}-{row['id'][:8]}.pdf"
+
+def send_quote_reply(to, subject, body, submission_id):
+    """Auto-reply with the submission's quote PDF attached."""
+    row = store.get(submission_id)
+    if row is None:
+        with span("smtp_send"):
+            deliver_email(to, subject, body)
+        return
+    with span("pdf_render"):
+        data, _ = quote_pdfs.read(row)
+    with span("smtp_send"):
+        deliver_email_with_pdf(to, subject, body, quote_filename(row), data)
+
+mail_queue = MailQueue(MAIL_QUEUE_DB, handlers={
+    "auto_reply": timed("smtp_send")(deliver_email),
+    "auto_reply_quote": send_quote_reply,
+    "plain_email": timed("smtp_send")(deliver_email),
+    "staff_notification": timed("smtp_send")(deliver_email_with_attachment),
+    "staff_notification_csv": timed("smtp_send")(deliver_email_with_csv),
+})
+
+# What the per-quote staff email carries: "row" (a one-line CSV of the new
+# quote), "full" (all of database.csv, the old behaviour) or "none". The
+# history arrives in batches from `python digest.py` instead.
+STAFF_ATTACHMENT = os.getenv("STAFF_ATTACHMENT", "row").strip().lower()
 
 
 def login_required(f):
@@ -105,22 +204,36 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def _connect_mysql():
+    import pymysql
+    import pymysql.cursors
+
+    return pymysql.connect(
+        host=os.getenv("MYSQL_HOST", "dorianridleysmith.mysql.pythonanywhere-services.com"),
+        user=os.getenv("MYSQL_USER", "dorianridleysmit"),
+        password=os.getenv("MYSQL_PASSWORD", ""),
+        database=os.getenv("MYSQL_DATABASE", "dorianridleysmit$default"),
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+
+# PythonAnywhere drops MySQL connections idle for 300s, so recycle before that.
+db_pool = ConnectionPool(
+    _connect_mysql,
+    max_size=int(os.getenv("MYSQL_POOL_SIZE", 5)),
+    max_lifetime=int(os.getenv("MYSQL_MAX_LIFETIME", 280)),
+)
+
 def get_db():
     if "db" not in g:
-        g.db = pymysql.connect(
-            host="dorianridleysmith.mysql.pythonanywhere-services.com",
-            user="dorianridleysmit",
-            password="dsautocaredb",
-            database="dorianridleysmit$default",
-            cursorclass=pymysql.cursors.DictCursor,
-        )
+        with span("mysql_connect"):
+            g.db = db_pool.get()
     return g.db
 
 @app.teardown_appcontext
 def close_db(error=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        db_pool.put(db, discard=error is not None)
 '''
 @app.before_request
 def enforce_canonical_url():
@@ -136,144 +249,200 @@ def enforce_canonical_url():
         )
         return redirect(new_url, code=301)
 '''
+
+def upload_image(filename):
+    """Responsive sources for a testimonial photo, or None until it's processed."""
+    info = image_pipeline.manifest.get(filename)
+    if not info:
+        return None
+    return picture_sources(info, lambda name: url_for('static', filename='uploads/variants/' + name))
+
+def upload_image_url(filename):
+    """URL to show a testimonial photo at: a variant, or the placeholder."""
+    img = upload_image(filename)
+    return img["src"] if img else url_for('static', filename=PHOTO_PENDING)
+
+def static_image(filename):
+    """Responsive sources for a static/images file, or None if it hasn't been built."""
+    info = gallery_manifest.get(filename)
+    if not info:
+        return None
+    return picture_sources(info, lambda name: url_for('static', filename='images/optimized/' + name))
+
+@app.context_processor
+def image_helpers():
+    return {"upload_image": upload_image, "upload_image_url": upload_image_url, "static_image": static_image}
+
+@app.after_request
+def compress_response(response):
+    # Flask runs after_request hooks in reverse order of registration. This
+    # one is registered before all the others, so it runs last and compresses
+    # the body and headers they leave behind.
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(request.headers.get("Accept-Encoding"), available_encodings())
+    data = response.get_data()
+    if encoding and len(data) >= MIN_SIZE:
+        response.set_data(compressed_cache.get(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)  # the bytes differ from the uncompressed page
+    return response
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def note_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_latency(error=None):
+    start = g.pop("request_start", None)
+    if start is None:
+        return
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    status = 500 if error is not None else g.pop("response_status", 500)
+    REQUEST_LATENCY.observe(time.perf_counter() - start, route, request.method, status)
+
+registry.register_collector("mysql_pool", db_pool.metrics)
+registry.register_collector("mail_queue", lambda: {"pending": mail_queue.pending_count()})
+registry.register_collector("recaptcha", lambda: dict(recaptcha.metrics(), breaker_open=recaptcha.breaker.state == "open"))
+registry.register_collector("page_cache", lambda: {"hits": page_cache.hits, "misses": page_cache.misses})
+registry.register_collector("quote_pdfs", quote_pdfs.metrics)
+registry.register_collector("rate_limit", rate_limiter.metrics)
+registry.register_collector("compressed_cache", lambda: {"hits": compressed_cache.hits, "misses": compressed_cache.misses})
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape target: admin session or ``Authorization: Bearer $METRICS_TOKEN``."""
+    token = os.getenv("METRICS_TOKEN", "")
+    auth = request.headers.get("Authorization", "")
+    if not session.get("logged_in") and not (token and hmac.compare_digest(auth, f"Bearer {token}")):
+        abort(403)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+def static_file(filename):
+    if not filename.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+        return app.send_static_file(filename)
+    path = safe_join(app.static_folder, filename)
+    siblings = {}
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        for encoding, suffix in PRECOMPRESSED:
+            try:
+                if os.stat(path + suffix).st_mtime_ns >= mtime:
+                    siblings[encoding] = suffix
+            except OSError:
+                pass
+    except (OSError, TypeError):
+        pass  # missing or unsafe path; send_static_file 404s
+    encoding = negotiate(request.headers.get("Accept-Encoding"), list(siblings))
+    if encoding:
+        response = send_from_directory(
+            app.static_folder, filename + siblings[encoding],
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        )
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = app.send_static_file(filename)
+    response.vary.add("Accept-Encoding")
+    return response
+
+app.view_functions["static"] = static_file
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == "static" and "v" not in values:
+        version = asset_versions.version(values.get("filename"))
+        if version:
+            values["v"] = version
+
+@app.after_request
+def cache_static(response):
+    if request.endpoint != "static" or response.status_code not in (200, 206, 304):
+        return response
+    filename = (request.view_args or {}).get("filename", "")
+    fingerprinted = asset_versions.covers(filename) and request.args.get("v") == asset_versions.version(filename)
+    if fingerprinted or (filename.startswith(CONTENT_ADDRESSED) and not filename.endswith(".json")):
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.headers.pop("Expires", None)
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def load_reviews():
-    if not os.path.isfile(REVIEWS_CSV):
-        return []
-    reviews = []
-    with open(REVIEWS_CSV, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f, fieldnames=CSV_FIELDS)
-        for row in reader:
-            if not row or not row.get('name', '').strip():
-                continue
-            reviews.append(row)
-    return reviews
+    return reviews_cache.all()
 
 def load_testimonials():
-    if not os.path.isfile(TESTIMONIALS_CSV):
-        return []
-    testimonials = []
-    with open(TESTIMONIALS_CSV, newline="") as f:
-        reader = csv.DictReader(f, fieldnames=CSV_FIELDS)
-        for row in reader:
-            if not row.get("name", "").strip():
-                continue
-            testimonials.append(row)
-    return testimonials
-
-def is_empty_submission(row):
-    for field in ("Name", "Email", "Car", "Phone", "Message"):
-        if row.get(field, "").strip():
-            return False
-    return row.get("Status", "").strip().lower() == "inbox"
+    with span("storage_read"):
+        return testimonial_store.rows()
 
 def read_submissions():
-    rows = []
-    if os.path.isfile(CSV_PATH):
-        with open(CSV_PATH, newline="") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-    if rows and "Status" not in rows[0]:
-        for row in rows:
-            row["Status"] = "inbox"
-        write_submissions(rows)
-    # Ensure all rows have 'id'
-    updated = False
-    for row in rows:
-        if 'id' not in row or not row['id'].strip():
-            row['id'] = str(uuid.uuid4())
-            updated = True
-    if updated:
-        write_submissions(rows)
-    return rows
-
-def write_submissions(rows):
-    with open(CSV_PATH, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=HEADERS, extrasaction="ignore")
-        writer.writeheader()
-        clean_rows = [{h: row.get(h, "") for h in HEADERS} for row in rows]
-        writer.writerows(clean_rows)
-
-def load_and_filter_submissions():
-    rows = read_submissions()
-    inbox, accepted, completed, trash = [], [], [], []
-    for row in rows:
-        if is_empty_submission(row):
-            row["Status"] = "trash"
-        state = row["Status"].strip().lower()
-        bucket = {"inbox": inbox, "accepted": accepted, "completed": completed}.get(state, trash)
-        bucket.append(row)
-    write_submissions(rows)
-    return inbox, accepted, completed, trash
+    with span("storage_read"):
+        return store.rows()
 
 def write_to_csv(data):
     id_val = str(uuid.uuid4())
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        is_new = not os.path.isfile(DATA_CSV)
-        with open(DATA_CSV, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=HEADERS)
-            if is_new:
-                writer.writeheader()
-            row = {
-                'id': id_val,
-                'Timestamp': timestamp,
-                'Name': data.get("name", "").strip(),
-                'Email': data.get("email", "").strip(),
-                'Car': data.get("car", "").strip(),
-                'Phone': data.get("phone", "").strip(),
-                'Is Mobile': data.get("is_mobile", "no").strip(),
-                'Contact Method': data.get("contact_method", "none").strip(),
-                'Best Time to Call': data.get("calltime", "").strip(),
-                'Preferred Appointment Time': data.get("appointmenttime", "").strip(),
-                'Message': data.get("message", "").strip(),
-                'Vehicle Type': data.get("vehicle_type", "").strip(),
-                'Services': data.get("services", "").strip(),
-                'Total': data.get("total", "").strip(),
-                'Status': "inbox",
-            }
-            writer.writerow(row)
+        row = {
+            'id': id_val,
+            'Timestamp': timestamp,
+            'Name': data.get("name", "").strip(),
+            'Email': data.get("email", "").strip(),
+            'Car': data.get("car", "").strip(),
+            'Phone': data.get("phone", "").strip(),
+            'Is Mobile': data.get("is_mobile", "no").strip(),
+            'Contact Method': data.get("contact_method", "none").strip(),
+            'Best Time to Call': data.get("calltime", "").strip(),
+            'Preferred Appointment Time': data.get("appointmenttime", "").strip(),
+            'Message': data.get("message", "").strip(),
+            'Vehicle Type': data.get("vehicle_type", "").strip(),
+            'Services': data.get("services", "").strip(),
+            'Total': data.get("total", "").strip(),
+            'Status': "inbox",
+        }
+        with span("storage_write"):
+            row = store.append(row)
 
         print("✅ Wrote to CSV")
+        return row
     except (OSError, csv.Error) as e:
         print("❌ CSV write failed:", e)
+        return None
 
 def update_submission_status(submission_id, new_status):
-    rows = read_submissions()
-    for row in rows:
-        if row.get('id') == submission_id:
-            row["Status"] = new_status
-            write_submissions(rows)
-            return
-    abort(404, description="Submission not found")
-
-def read_csv_file():
-    try:
-        with open(CSV_PATH, mode='r', newline='') as f:
-            reader = csv.reader(f)
-            headers = next(reader, [])
-            rows = list(reader)
-    except FileNotFoundError:
-        return [], []
-    if "Status" not in headers:
-        headers.append("Status")
-        rows = [row + ["inbox"] for row in rows]
-        write_submissions(rows)
-    return headers, rows
+    with span("storage_write"):
+        found = store.set_status(submission_id, new_status)
+    if not found:
+        abort(404, description="Submission not found")
 
 def send_reminder_email(to, subject, body):
-    msg = Message(subject, recipients=[to])
-    msg.body = body
     try:
-        mail.send(msg)
+        with span("smtp_send"):
+            deliver_email(to, subject, body)
         print(f"✅ Email sent to {to}")
     except Exception as e:
         print(f"❌ Failed to send email to {to}: {e}")
 
 
 def create_message(sender, to, subject, message_text):
+    import base64
+    from email.mime.text import MIMEText
+
     msg = MIMEText(message_text)
     msg['to'] = to
     msg['from'] = sender
@@ -301,10 +470,12 @@ If you enjoy your experience with us, please consider leaving a Google review to
 
 — Dorian @ DS Auto Care
 """
-    msg = Message(subject, recipients=[to_email], body=body)
+    from smtplib import SMTPDataError
+
     try:
-        mail.send(msg)
-    except smtplib.SMTPDataError as e:
+        with span("smtp_send"):
+            deliver_email(to_email, subject, body)
+    except SMTPDataError as e:
         print("SMTPDataError:", e)
     except Exception as e:
         print(f"Failed to send auto-reply: {e}")
@@ -317,13 +488,18 @@ def home():
     """
     all_reviews = load_reviews()
     review_count = len(all_reviews)  # Renamed for clarity; adjust template if needed
-    # Random 3 reviews for gallery
-    featured_reviews = random.sample(all_reviews, k=min(3, len(all_reviews))) if all_reviews else []
-    return render_template(
+    # Random 3 reviews for gallery, drawn from a pre-sampled rotation so the
+    # rendered page can be reused
+    selection, featured_reviews = reviews_cache.featured()
+    # A photo's variants can land after the page was first rendered with the
+    # placeholder, and build_images.py can rebuild the gallery images, so
+    # both manifests' versions are part of the key.
+    key = (selection, image_pipeline.manifest.version(), gallery_manifest.version())
+    return reviews_cache.render(key, lambda: render_template(
         "index.html",
         featured_reviews=featured_reviews,
         submission_count=review_count  # Keep old name if template expects it
-    )
+    ))
 
 @app.route("/register", methods=["GET", "POST"])
 def register():
@@ -332,14 +508,17 @@ def register():
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
         password_hash = generate_password_hash(password)
+        from pymysql.err import IntegrityError
+
         db = get_db()
         with db.cursor() as cursor:
             try:
-                cursor.execute(
-                    "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
-                    (name, email, password_hash),
-                )
-                db.commit()
+                with span("mysql_query"):
+                    cursor.execute(
+                        "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+                        (name, email, password_hash),
+                    )
+                    db.commit()
             except IntegrityError:
                 return "<h3>Email already registered. Try logging in.</h3>"
         return redirect(url_for("login"))
@@ -354,10 +533,12 @@ def register():
     '''
 
 @app.route("/cargallery")
+@page_cache.cached()
 def cargallery():
     return render_template("cargallery.html")
 
 @app.route("/testimonial_form")
+@page_cache.cached()
 def testimonial_form():
     return render_template("testimonial_form.html")
 
@@ -368,8 +549,9 @@ def login():
         password = request.form.get("password", "")
         db = get_db()
         with db.cursor() as cursor:
-            cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-            user = cursor.fetchone()
+            with span("mysql_query"):
+                cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+                user = cursor.fetchone()
         if user and check_password_hash(user["password_hash"], password):
             session["user_id"] = user["id"]
             return redirect(url_for("dashboard"))
@@ -384,30 +566,44 @@ def login():
     '''
 
 
+def too_many_requests(retry_after):
+    response = Response("Too many requests. Please try again later.", 429, mimetype="text/plain")
+    response.headers["Retry-After"] = str(int(retry_after) + 1)
+    return response
+
 @app.route("/send-email", methods=["POST"])
 def send_email():
+    # Junk is shed here, before reCAPTCHA, the CSV append or any email.
     # Honeypot: silently drop bots
     if request.form.get("website"):
+        rate_limiter.shed("honeypot")
         return redirect(url_for("cargallery"))
 
     # Required fields
     name = request.form.get("name", "").strip()
     email_addr = request.form.get("email", "").strip()
     if not (name and email_addr):
+        rate_limiter.shed("empty")
+        return redirect(url_for("cargallery"))
+    if "@" not in email_addr:
+        rate_limiter.shed("invalid_email")
         return redirect(url_for("cargallery"))
 
-    # reCAPTCHA (keep as-is)
+    allowed, retry_after = rate_limiter.check("send_email_ip", request.remote_addr)
+    if allowed:
+        allowed, retry_after = rate_limiter.check("send_email_address", email_addr.lower())
+    if not allowed:
+        return too_many_requests(retry_after)
+
+    # reCAPTCHA
     recaptcha_response = request.form.get("g-recaptcha-response", "")
-    secret = os.getenv("RECAPTCHA_SECRET_KEY", "")
     try:
-        resp = requests.post(
-            "https://www.google.com/recaptcha/api/siteverify",
-            data={"secret": secret, "response": recaptcha_response},
-            timeout=5
-        )
-        if not resp.json().get("success"):
+        with span("recaptcha"):
+            human = recaptcha.verify(recaptcha_response, request.remote_addr)
+        if not human:
             return "Captcha verification failed. Please try again.", 400
-    except requests.RequestException:
+    except CaptchaUnavailable as e:
+        app.logger.warning("reCAPTCHA unavailable: %s", e)
         return "Captcha verification unavailable. Please try again later.", 500
 
     # Extract fields safely (use Flask helpers)
@@ -453,8 +649,9 @@ def send_email():
     }
 
     # Write to CSV safely
+    row = None
     try:
-        write_to_csv(data)
+        row = write_to_csv(data)
         app.logger.info("Wrote quote to CSV for %s", email_addr)
     except (OSError, csv.Error) as e:
         app.logger.exception("CSV write failed")
@@ -462,24 +659,32 @@ def send_email():
 
     # Auto-reply to user
     subject = "Your Quote from DS Auto Care"
+    pdf_note = (
+        f"Your quote is attached as a PDF, and you can download it again any time:\n{quote_url(row['id'])}\n\n"
+        if row else ""
+    )
     body = (
         f"Hi {name},\n\n"
         f"Thanks for requesting your service! Here's a summary:\n"
         f"Vehicle Type: {vehicle_type}\n"
         f"Services: {services}\n"
         f"Total Estimate: ${total}\n\n"
+        f"{pdf_note}"
         f"We're excited to work on your {car}, it's in great hands!\n\n"
         f"Keep your ringer on! Ill reach out to confirm your appointment as soon as I can!\n\n"
 
         f"— Dorian @ DS Auto Care\n"
     )
     try:
-        msg = Message(subject, recipients=[email_addr], body=body)
-        mail.send(msg)
+        if row:
+            mail_queue.enqueue("auto_reply_quote", to=email_addr, subject=subject, body=body, submission_id=row["id"])
+        else:
+            mail_queue.enqueue("auto_reply", to=email_addr, subject=subject, body=body)
     except Exception:
-        app.logger.exception("Failed to send auto-reply")
+        app.logger.exception("Failed to queue auto-reply")
 
-    # Email staff (include quote details) and attach CSV
+    # Email staff (include quote details) and attach the new row; both emails go
+    # out from the mail queue after we've redirected.
     staff_subject = "New Quote Request from DS Auto Care"
     staff_body = (
         f"Name: {name}\n"
@@ -495,10 +700,21 @@ def send_email():
         f"Additional Notes:\n{message}\n"
     )
     try:
-        csv_path = os.path.join(app.root_path, "database.csv")
-        send_email_with_attachment(staff_subject, staff_body, csv_path)
+        if STAFF_ATTACHMENT == "full":
+            csv_path = os.path.join(app.root_path, "database.csv")
+            mail_queue.enqueue("staff_notification", subject=staff_subject, body=staff_body, csv_file_path=csv_path)
+        elif STAFF_ATTACHMENT == "row" and row:
+            mail_queue.enqueue(
+                "staff_notification_csv",
+                subject=staff_subject,
+                body=staff_body,
+                filename=f"quote-{row['Timestamp'].replace(' ', '_').replace(':', '')}.csv",
+                data=rows_to_csv([row]),
+            )
+        else:
+            mail_queue.enqueue("plain_email", to=os.getenv("EMAIL_USER"), subject=staff_subject, body=staff_body)
     except Exception:
-        app.logger.exception("Failed to send staff email")
+        app.logger.exception("Failed to queue staff email")
 
     return redirect(url_for("cargallery"))
 
@@ -541,11 +757,20 @@ def submit_testimonial():
     Process testimonial submission (separate from contact form).
     """
     form = request.form
+    if form.get("website"):
+        rate_limiter.shed("honeypot")
+        return redirect("/reviews")
     name = form.get("name", "").strip()
     car = form.get("car", "").strip()
     service_type = form.get("service_type", "unspecified").strip()
     service_date = form.get("service_date", "").strip()
     testimonial = form.get("testimonial", "").strip()
+    if not (name or testimonial):
+        rate_limiter.shed("empty")
+        return redirect("/reviews")
+    allowed, retry_after = rate_limiter.check("testimonial_ip", request.remote_addr)
+    if not allowed:
+        return too_many_requests(retry_after)
     before_photo = request.files.get("before_photo")
     after_photo = request.files.get("after_photo")
     if not (before_photo and after_photo and allowed_file(before_photo.filename) and allowed_file(after_photo.filename)):
@@ -554,12 +779,26 @@ def submit_testimonial():
     after_filename = f"after_{uuid.uuid4().hex}_{secure_filename(after_photo.filename)}"
     before_photo.save(os.path.join(app.config["UPLOAD_FOLDER"], before_filename))
     after_photo.save(os.path.join(app.config["UPLOAD_FOLDER"], after_filename))
-    with open(TESTIMONIALS_CSV, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([name, car, service_date, testimonial, before_filename, after_filename, service_type])
+    for filename in (before_filename, after_filename):
+        try:
+            image_pipeline.submit(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+        except Exception:
+            app.logger.exception("Could not queue image processing for %s", filename)
+    with span("storage_write"):
+        testimonial_store.append({
+            'name': name,
+            'car': car,
+            'date': service_date,
+            'testimonial': testimonial,
+            'before': before_filename,
+            'after': after_filename,
+            'service_type': service_type,
+        })
+    page_cache.invalidate("/reviews.json")
     return redirect("/reviews")
 
 @app.route('/sitemap.xml', methods=['GET'])
+@page_cache.cached(ttl=86400)
 def sitemap():
     pages = [
         {'loc': url_for('home', _external=True), 'changefreq':'daily', 'priority':'1.0'},
@@ -579,84 +818,196 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+SUBMISSIONS_PAGE_SIZE = 50
+
+def quote_token(submission_id):
+    """Unguessable per-submission token, so customers can fetch their own PDF."""
+    key = app.secret_key.encode("utf-8") if isinstance(app.secret_key, str) else app.secret_key
+    return hmac.new(key, submission_id.encode("utf-8"), "sha256").hexdigest()[:24]
+
+def quote_url(submission_id):
+    return url_for("quote_pdf", submission_id=submission_id, t=quote_token(submission_id), _external=True)
+
+@app.route("/quote/<submission_id>.pdf")
+def quote_pdf(submission_id):
+    """The quote (or invoice, once completed) as a PDF, for staff or the token holder."""
+    if not session.get("logged_in") and not hmac.compare_digest(request.args.get("t", ""), quote_token(submission_id)):
+        abort(404)
+    row = store.get(submission_id)
+    if row is None:
+        abort(404)
+    with span("pdf_render"):
+        path, etag = quote_pdfs.get(row)
+    response = send_file(path, mimetype="application/pdf", download_name=quote_filename(row),
+                         etag=etag, conditional=True, max_age=0)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def submission_filters(args):
+    """Dashboard query parameters, normalised for ``store.search``."""
+    status = args.get("status", "inbox").strip().lower()
+    sort = args.get("sort", "timestamp").strip().lower()
+    try:
+        page = max(1, int(args.get("page", 1)))
+        per_page = min(200, max(1, int(args.get("per_page", SUBMISSIONS_PAGE_SIZE))))
+    except ValueError:
+        page, per_page = 1, SUBMISSIONS_PAGE_SIZE
+    return {
+        "q": args.get("q", "").strip(),
+        "status": status if status in SUBMISSION_STATUSES else "inbox",
+        "vehicle_type": args.get("vehicle_type", "").strip(),
+        "service": args.get("service", "").strip(),
+        "date_from": args.get("from", "").strip(),
+        "date_to": args.get("to", "").strip(),
+        "sort": sort if sort in SORT_KEYS else "timestamp",
+        "descending": args.get("order", "desc") != "asc",
+        "offset": (page - 1) * per_page,
+        "limit": per_page,
+    }, page, per_page
+
 @app.route("/submissions")
 @login_required
 def submissions():
-    # Load all rows from your existing loader
-    rows = read_submissions()  # expected: list of dicts
-    # Prepare empty buckets
-    buckets = {"inbox": [], "accepted": [], "completed": [], "trash": []}
-
-    # Map rows into buckets based on Status field
-    for row in rows:
-        # Status can come from new form fields; normalize to a simple key
-        raw_status = row.get("Status", row.get("status", "inbox"))
-        if raw_status is None:
-            raw_status = "inbox"
-        st = str(raw_status).strip().lower()
-        # Normalize obvious synonyms
-        if st in ("inbox", "new", "pending", ""):
-            key = "inbox"
-        elif st in ("accepted", "accept"):
-            key = "accepted"
-        elif st in ("completed", "complete", "done"):
-            key = "completed"
-        elif st in ("trash", "deleted", "deleted-by-user"):
-            key = "trash"
-        else:
-            # unknown status -> log and send to inbox (safe fallback)
-            logger.warning("Unknown submission status %r for row id %s; routing to inbox", st, row.get('id'))
-            key = "inbox"
-        buckets[key].append(row)
-
-    # Keep your previous filter logic for inbox to avoid empty junk rows
-    def has_content(r):
-        return any(r.get(f, "").strip() for f in ("Name", "Email", "Car", "Message"))
-
-    filtered_inbox = [r for r in buckets["inbox"] if has_content(r)]
-
-    # For now we keep HEADERS to avoid changing the template contract:
+    # Searched, filtered and paged from the store's incremental index, so a
+    # page costs the same whatever the size of database.csv.
+    filters, page, per_page = submission_filters(request.args)
+    with span("storage_read"):
+        result = store.search(**filters)
+        facets = store.facets()
+    # Query string for links that keep the current filters.
+    current = {k: v for k, v in request.args.items() if v and k != "page"}
     return render_template(
         "submissions.html",
         headers=HEADERS,
-        inbox=filtered_inbox,
-        accepted=buckets["accepted"],
-        completed=buckets["completed"],
-        trash=buckets["trash"],
+        rows=result.rows,
+        total=result.total,
+        counts=result.counts,
+        facets=facets,
+        filters=filters,
+        current=current,
+        page=page,
+        pages=max(1, -(-result.total // per_page)),
+        statuses=SUBMISSION_STATUSES,
     )
 
+def back_to_submissions():
+    """Return to the dashboard view the action was taken from."""
+    target = request.form.get("next", "")
+    if target.startswith("/submissions") and not target.startswith("//"):
+        return redirect(target)
+    return redirect(url_for("submissions"))
+
 @app.route("/accept/<string:id>", methods=["POST"])
 @login_required
 def accept_job(id):
     update_submission_status(id, "accepted")
     flash("Moved to Accepted", "success")
-    return redirect(url_for("submissions"))
+    return back_to_submissions()
 
 @app.route("/complete/<string:id>", methods=["POST"])
 @login_required
 def complete_job(id):
     update_submission_status(id, "completed")
     flash("Marked as Completed", "success")
-    return redirect(url_for("submissions"))
+    return back_to_submissions()
 
 @app.route("/delete/<string:id>", methods=["POST"])
 @login_required
 def delete_job(id):
     update_submission_status(id, "trash")
     flash("Moved to Trash", "warning")
-    return redirect(url_for("submissions"))
+    return back_to_submissions()
+
+SUBMISSION_STATUSES = ("inbox", "accepted", "completed", "trash")
+BULK_STATUS_LIMIT = 1000
+
+@app.route("/submissions/export")
+@login_required
+def export_submissions():
+    """
+    Stream submissions as CSV or NDJSON (``format``), optionally gzipped
+    (``gzip=1``), filtered by ``status`` and ``from``/``to`` dates. Rows are
+    read from the store a chunk at a time and written out as they come, so
+    memory stays flat however much is exported.
+
+    ``status=all`` (or none) exports every row, the empty inbox rows the
+    list hides included; a single status leaves those out, as the list does.
+    """
+    fmt = request.args.get("format", "csv").strip().lower()
+    status = request.args.get("status", "").strip().lower()
+    if fmt not in EXPORT_FORMATS or (status and status != "all" and status not in SUBMISSION_STATUSES):
+        abort(400, description="Unknown export format or status")
+    compressed = request.args.get("gzip", "").strip().lower() in ("1", "true", "yes")
+    date_from, date_to = request.args.get("from", "").strip(), request.args.get("to", "").strip()
+
+    rows = store.export(status=None if status in ("", "all") else status, date_from=date_from, date_to=date_to)
+    body = encode_rows(rows, fmt, HEADERS)
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    if compressed:
+        body, mimetype, ext = gzip_stream(body), "application/gzip", ext + ".gz"
+    filename = "-".join(p for p in ("submissions", status or "all", date_from, date_to) if p) + "." + ext
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{secure_filename(filename)}"'
+    response.headers["Cache-Control"] = "private, no-store"
+    response.headers["X-Accel-Buffering"] = "no"  # let nginx pass chunks straight through
+    return response
+
+@app.route("/submissions/bulk", methods=["POST"])
+@login_required
+def bulk_status():
+    """
+    Move many submissions to one status in a single store write. Takes a
+    form (``ids`` checkboxes + ``status``) or JSON ``{"ids": [...], "status": ...}``;
+    JSON callers get per-id results back, the dashboard gets a flash.
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            abort(400, description='Expected a JSON object {"ids": [...], "status": ...}')
+        ids, status = payload.get("ids"), payload.get("status")
+        if not (isinstance(ids, list) and ids and all(isinstance(i, str) for i in ids)):
+            abort(400, description='"ids" must be a non-empty list of submission id strings')
+        if not isinstance(status, str):
+            abort(400, description='"status" must be a string')
+    else:
+        ids, status = request.form.getlist("ids"), request.form.get("status", "")
+    status = status.strip().lower()
+    ids = list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+    if status not in SUBMISSION_STATUSES:
+        abort(400, description=f"Unknown status {status!r}")
+    if len(ids) > BULK_STATUS_LIMIT:
+        abort(400, description=f"At most {BULK_STATUS_LIMIT} submissions per request")
+    if not ids:
+        if request.is_json:
+            abort(400, description='"ids" must be a non-empty list of submission id strings')
+        flash("No submissions selected.", "warning")
+        return back_to_submissions()
+
+    with span("storage_write"):
+        updated = set(store.set_statuses({sid: status for sid in ids}))
+    results = {sid: "updated" if sid in updated else "not_found" for sid in ids}
+
+    if request.is_json:
+        return jsonify({"status": status, "updated": len(updated), "not_found": len(ids) - len(updated), "results": results})
+    missing = len(ids) - len(updated)
+    flash(
+        f"Moved {len(updated)} submission(s) to {status.capitalize()}."
+        + (f" {missing} could not be found." if missing else ""),
+        "success" if not missing else "warning",
+    )
+    return back_to_submissions()
 
 @app.route('/clear_inbox', methods=['POST'])
 @login_required
 def clear_inbox():
-    rows = read_submissions()
-    moved = 0
-    for row in rows:
-        is_empty = (row['Status'] == 'inbox' and not any(row[field].strip() for field in ["Name", "Email", "Car", "Phone", "Message"]))
-        if is_empty:
-            row['Status'] = 'trash'
-            moved += 1
-    write_submissions(rows)
+    empty_ids = {
+        row['id']: 'trash'
+        for row in read_submissions()
+        if row['Status'] == 'inbox' and not any(row[field].strip() for field in ["Name", "Email", "Car", "Phone", "Message"])
+    }
+    with span("storage_write"):
+        moved = len(store.set_statuses(empty_ids)) if empty_ids else 0
     flash(f"Moved {moved} empty submissions to Trash.", 'info')
     return redirect(url_for('submissions'))
 
@@ -664,10 +1015,52 @@ def clear_inbox():
 def too_large(e):
     return "<h3>File too large. Please keep uploads under 3MB.</h3>", 413
 
+REVIEWS_PAGE_SIZE = 10
+
+def reviews_page():
+    """
+    One page of reviews after ?cursor=. Reviews are only ever appended, so
+    the cursor is simply the position of the next review in the cached list.
+    """
+    all_reviews = load_reviews()
+    try:
+        cursor = max(0, int(request.args.get("cursor", 0)))
+    except ValueError:
+        cursor = 0
+    try:
+        limit = min(50, max(1, int(request.args.get("limit", REVIEWS_PAGE_SIZE))))
+    except ValueError:
+        limit = REVIEWS_PAGE_SIZE
+    page = all_reviews[cursor:cursor + limit]
+    next_cursor = cursor + limit if cursor + limit < len(all_reviews) else None
+    return page, next_cursor
+
 @app.route("/reviews")
 def reviews():
-    reviews = load_reviews()
-    return render_template("reviews.html", reviews=reviews)
+    page, next_cursor = reviews_page()
+    # Streamed so the header and first cards go out before the rest render.
+    return Response(stream_template("reviews.html", reviews=page, next_cursor=next_cursor), mimetype="text/html")
+
+@app.route("/reviews.json")
+@page_cache.cached()
+def reviews_json():
+    page, next_cursor = reviews_page()
+    return jsonify({
+        # Photos only as variant URLs, not the uploads' own filenames.
+        "reviews": [
+            {
+                "name": review.name,
+                "car": review.car,
+                "date": review.date,
+                "testimonial": review.testimonial,
+                "service_type": review.service_type,
+                "before_url": upload_image_url(review.before),
+                "after_url": upload_image_url(review.after),
+            }
+            for review in page
+        ],
+        "next_cursor": next_cursor,
+    })
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
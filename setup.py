@@ -1,7 +1,10 @@
 import sqlite3
 
+from storage import SQLITE_SCHEMA
+
 conn = sqlite3.connect("site.db")
+conn.executescript(SQLITE_SCHEMA)
 with open("schema.sql") as f:
     conn.executescript(f.read())
 conn.commit()
-conn.close()
\ No newline at end of file
+conn.close()
@@ -0,0 +1,135 @@
+import time
+import smtplib
+import threading
+from contextlib import contextmanager
+
+
+class SMTPPool:
+    """
+    Keeps a few authenticated SMTP sessions open and hands them out.
+
+    A session that has sat idle for ``check_after`` seconds is NOOP-checked
+    before reuse, sessions idle for ``idle_timeout`` seconds are closed, and
+    a session that errors while in use is thrown away rather than returned.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 max_size=2, idle_timeout=60, check_after=10, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.timeout = timeout
+        self._idle = []  # (smtp, last_used), most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._reaper = None
+
+    def _open(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+            if self.username and self.password and self.use_tls:
+                conn.login(self.username, self.password)
+        except Exception:
+            _close_quietly(conn)
+            raise
+        return conn
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                _close_quietly(conn)
+                continue
+            if idle_for > self.check_after:
+                try:
+                    if conn.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except (smtplib.SMTPException, OSError):
+                    _close_quietly(conn)
+                    continue
+            return conn
+        return self._open()
+
+    def _release(self, conn):
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+        self._start_reaper()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a live session; at most ``max_size`` are in use at once."""
+        self._slots.acquire()
+        try:
+            conn = self._acquire()
+            try:
+                yield conn
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, OSError):
+                _close_quietly(conn)
+                raise
+            except BaseException:
+                self._release(conn)
+                raise
+            else:
+                self._release(conn)
+        finally:
+            self._slots.release()
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        """Send ``msg``, retrying once on a fresh session if a pooled one had gone stale."""
+        try:
+            with self.connection() as conn:
+                return conn.send_message(msg, from_addr, to_addrs)
+        except smtplib.SMTPServerDisconnected:
+            with self.connection() as conn:
+                return conn.send_message(msg, from_addr, to_addrs)
+
+    def close_idle(self, max_idle=None):
+        """Close sessions idle longer than ``max_idle`` (default ``idle_timeout``)."""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            stale = [conn for conn, last_used in self._idle if last_used <= cutoff]
+            self._idle = [(conn, last_used) for conn, last_used in self._idle if last_used > cutoff]
+        for conn in stale:
+            _close_quietly(conn)
+        return len(stale)
+
+    def close_all(self):
+        return self.close_idle(max_idle=-1)
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None:
+                return
+            reaper = self._reaper = threading.Thread(target=self._reap, name="smtp-pool-reaper", daemon=True)
+        reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(self.idle_timeout)
+            self.close_idle()
+            with self._lock:
+                if not self._idle:
+                    self._reaper = None
+                    return
+
+
+def _close_quietly(conn):
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        try:
+            conn.close()
+        except OSError:
+            pass
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Measure how long a fresh worker takes to import server.py, and how big it is.
+
+    python startup_benchmark.py                    # 5 cold imports, report
+    python startup_benchmark.py --budget-ms 250    # exit 1 if slower (for CI)
+
+Each run imports server in a new interpreter under ``python -X importtime``
+and reports the median import time, the slowest modules server pulls in
+directly, and the worker's peak RSS. The check fails (exit 1) if the median
+is over ``--budget-ms``, the RSS is over ``--budget-mb``, or any module in
+``--deferred`` was imported: those are meant to load on first use only.
+"""
+import os
+import sys
+import json
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Only needed by some requests; importing server must not load them.
+DEFERRED = ("reportlab", "requests", "pymysql", "flask_mail", "smtplib", "PIL", "concurrent.futures.process")
+
+CHILD = """
+import sys, json, time, resource
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "wall_ms": elapsed * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """{module: cumulative µs} for server and the modules it imports directly."""
+    # Children are printed before their parent, so collect depth-1 entries
+    # until the top-level line they belong to shows up.
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            pending[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == "server":
+                pending["server"] = int(cumulative)
+                return pending
+            pending = {}
+    return {}
+
+
+def cold_import(scratch):
+    env = dict(os.environ)
+    # Keep the run's side files out of the checkout.
+    env.setdefault("MAIL_QUEUE_DB", os.path.join(scratch, "mail_queue.db"))
+    env.setdefault("PAGE_CACHE_BACKEND", "memory")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit("❌ import server failed")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server.py cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 0)),
+                        help="fail if the median import of server takes longer (0 = no limit)")
+    parser.add_argument("--budget-mb", type=float, default=float(os.getenv("STARTUP_BUDGET_MB", 0)),
+                        help="fail if a fresh worker's peak RSS is larger (0 = no limit)")
+    parser.add_argument("--deferred", default=",".join(DEFERRED),
+                        help="comma-separated modules that importing server must not load")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="startup-") as scratch:
+        runs = [cold_import(scratch) for _ in range(args.runs)]
+
+    import_ms = statistics.median(r["imports"].get("server", 0) / 1000 for r in runs)
+    wall_ms = statistics.median(r["wall_ms"] for r in runs)
+    rss_mb = statistics.median(r["rss_mb"] for r in runs)
+    children = {}
+    for r in runs:
+        for name, us in r["imports"].items():
+            if name != "server":
+                children.setdefault(name, []).append(us / 1000)
+    slowest = sorted(((statistics.median(v), k) for k, v in children.items()), reverse=True)[:args.top]
+    deferred = [m.strip() for m in args.deferred.split(",") if m.strip()]
+    loaded = sorted(m for m in deferred if m in runs[-1]["modules"])
+
+    print(f"import server: {import_ms:8.1f} ms (median of {len(runs)}, {wall_ms:.1f} ms wall)")
+    print(f"peak RSS:      {rss_mb:8.1f} MB, {len(runs[-1]['modules'])} modules")
+    print("slowest direct imports:")
+    for ms, name in slowest:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "import_ms": import_ms, "wall_ms": wall_ms, "rss_mb": rss_mb,
+                "modules": len(runs[-1]["modules"]), "slowest": [[n, ms] for ms, n in slowest],
+                "deferred_loaded": loaded,
+            }, f, indent=2)
+
+    failures = []
+    if loaded:
+        failures.append(f"imported at startup but meant to be deferred: {', '.join(loaded)}")
+    if args.budget_ms and import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.1f} ms, budget {args.budget_ms:.0f} ms")
+    if args.budget_mb and rss_mb > args.budget_mb:
+        failures.append(f"peak RSS {rss_mb:.1f} MB, budget {args.budget_mb:.0f} MB")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Startup within budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import hashlib
+import threading
+
+# Far-future caching for files whose URL changes whenever their content does.
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class AssetVersions:
+    """
+    Content hashes of the files under ``prefixes`` in the static folder,
+    used as a ``?v=`` fingerprint on their URLs. A hash is recomputed only
+    when the file's size or mtime changes, so edits to main.css show up
+    without a restart while unchanged files cost a single stat.
+    """
+
+    def __init__(self, static_folder, prefixes=("assets/",)):
+        self.static_folder = static_folder
+        self.prefixes = tuple(prefixes)
+        self._lock = threading.Lock()
+        self._hashes = {}  # filename -> ((size, mtime), hash)
+
+    def covers(self, filename):
+        return bool(filename) and filename.startswith(self.prefixes)
+
+    def version(self, filename):
+        """Short content hash for ``filename``, or None if it isn't fingerprinted."""
+        if not self.covers(filename):
+            return None
+        path = os.path.join(self.static_folder, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._hashes.get(filename)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        value = digest.hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (key, value)
+        return value
+
+    def manifest(self):
+        """Every fingerprinted file and its current hash."""
+        versions = {}
+        for prefix in self.prefixes:
+            root = os.path.join(self.static_folder, prefix)
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    rel = os.path.relpath(os.path.join(dirpath, name), self.static_folder).replace(os.sep, "/")
+                    versions[rel] = self.version(rel)
+        return versions
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Storage backends for quote submissions and testimonials.
+
+``STORAGE_BACKEND=csv`` (the default) keeps database.csv/testimonials.csv;
+``STORAGE_BACKEND=sqlite`` keeps both in indexed tables in site.db (WAL
+mode). Both backends expose the same methods, so server.py doesn't care
+which one it gets. Import the existing CSVs once with:
+
+    python storage.py migrate
+"""
+import io
+import os
+import csv
+import uuid
+import sqlite3
+import threading
+
+from file_lock import locked, append_record
+from submission_store import SubmissionStore, HEADERS
+from submission_index import (
+    STATUS_SYNONYMS, SearchResult, date_bounds, search_tokens, services_of, status_bucket, tokenize,
+)
+
+TESTIMONIAL_FIELDS = [
+    'name',
+    'car',
+    'date',
+    'testimonial',
+    'before',
+    'after',
+    'service_type'
+]
+
+# "Is Mobile" -> is_mobile, etc.
+SUBMISSION_COLUMNS = [h.lower().replace(" ", "_") for h in HEADERS]
+TESTIMONIAL_COLUMNS = ["name", "car", "date", "testimonial", "before_photo", "after_photo", "service_type"]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    car TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    is_mobile TEXT NOT NULL DEFAULT '',
+    contact_method TEXT NOT NULL DEFAULT '',
+    best_time_to_call TEXT NOT NULL DEFAULT '',
+    preferred_appointment_time TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    vehicle_type TEXT NOT NULL DEFAULT '',
+    services TEXT NOT NULL DEFAULT '',
+    total TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'inbox',
+    search_tokens TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions (status);
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp ON submissions (timestamp);
+
+CREATE TABLE IF NOT EXISTS testimonials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL DEFAULT '',
+    car TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL DEFAULT '',
+    testimonial TEXT NOT NULL DEFAULT '',
+    before_photo TEXT NOT NULL DEFAULT '',
+    after_photo TEXT NOT NULL DEFAULT '',
+    service_type TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO store_meta (name, version) VALUES ('submissions', 0), ('testimonials', 0);
+"""
+
+
+def _token_text(row):
+    """search_tokens column value: " tok1 tok2 ...", so LIKE '% pre%' finds token prefixes."""
+    return "".join(" " + token for token in sorted(search_tokens(row)))
+
+
+class _SqliteBase:
+    """Per-thread (and per-process) connections to one WAL-mode database."""
+
+    meta_name = None
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.version = 0
+        with self._conn() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _bump(self, conn):
+        conn.execute("UPDATE store_meta SET version = version + 1 WHERE name = ?", (self.meta_name,))
+
+    def refresh(self):
+        """Current data version, shared by every process using the database."""
+        row = self._conn().execute("SELECT version FROM store_meta WHERE name = ?", (self.meta_name,)).fetchone()
+        self.version = row[0] if row else 0
+        return self.version
+
+    def compact(self):
+        self._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+class SqliteSubmissionStore(_SqliteBase):
+    """SubmissionStore-compatible backend on an indexed ``submissions`` table."""
+
+    meta_name = "submissions"
+    _select = f"SELECT {', '.join(SUBMISSION_COLUMNS)} FROM submissions"
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self._add_search_tokens()
+
+    def _add_search_tokens(self):
+        """Add and fill the search_tokens column on a database created before it."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # one worker migrates, the rest then see the column
+        try:
+            if "search_tokens" not in {r[1] for r in conn.execute("PRAGMA table_info(submissions)")}:
+                conn.execute("ALTER TABLE submissions ADD COLUMN search_tokens TEXT NOT NULL DEFAULT ''")
+                records = conn.execute(f"SELECT {', '.join(SUBMISSION_COLUMNS)} FROM submissions").fetchall()
+                conn.executemany(
+                    "UPDATE submissions SET search_tokens = ? WHERE id = ?",
+                    ((_token_text(self._to_row(r)), r[0]) for r in records),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _to_row(record):
+        return dict(zip(HEADERS, record))
+
+    def rows(self):
+        self.refresh()
+        return [self._to_row(r) for r in self._conn().execute(self._select + " ORDER BY rowid")]
+
+    def get(self, submission_id):
+        record = self._conn().execute(self._select + " WHERE id = ?", (submission_id,)).fetchone()
+        return self._to_row(record) if record else None
+
+    def append(self, row):
+        row = {h: row.get(h, "") or "" for h in HEADERS}
+        if not row["id"]:
+            row["id"] = str(uuid.uuid4())
+        with self._conn() as conn:
+            self._insert(conn, [row])
+            self._bump(conn)
+        return row
+
+    @staticmethod
+    def _insert(conn, rows, ignore_existing=False):
+        conn.executemany(
+            f"INSERT {'OR IGNORE ' if ignore_existing else ''}INTO submissions "
+            f"({', '.join(SUBMISSION_COLUMNS)}, search_tokens) "
+            f"VALUES ({', '.join('?' for _ in SUBMISSION_COLUMNS)}, ?)",
+            ([row.get(h, "") or "" for h in HEADERS] + [_token_text(row)] for row in rows),
+        )
+
+    def set_status(self, submission_id, status):
+        return bool(self.set_statuses({submission_id: status}))
+
+    def set_statuses(self, updates):
+        """Apply several status changes in one transaction; returns the ids found."""
+        changed = []
+        with self._conn() as conn:
+            for sid, status in updates.items():
+                if conn.execute("UPDATE submissions SET status = ? WHERE id = ?", (status, sid)).rowcount:
+                    changed.append(sid)
+            if changed:
+                self._bump(conn)
+        return changed
+
+    def replace_all(self, rows):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM submissions")
+            self._insert(conn, [dict(row, id=row.get("id") or str(uuid.uuid4())) for row in rows])
+            self._bump(conn)
+
+    # Same buckets as SubmissionIndex: unknown statuses count as inbox, and
+    # inbox rows without any content are hidden.
+    _OTHER_STATUSES = [st for synonyms in STATUS_SYNONYMS.values() for st in synonyms]
+    _HIDDEN = (
+        f"(lower(trim(status)) NOT IN ({', '.join('?' for _ in _OTHER_STATUSES)})"
+        " AND trim(name) = '' AND trim(email) = '' AND trim(car) = '' AND trim(message) = '')"
+    )
+
+    def _status_clause(self, status):
+        if status == "inbox":
+            return (f"lower(trim(status)) NOT IN ({', '.join('?' for _ in self._OTHER_STATUSES)})",
+                    list(self._OTHER_STATUSES))
+        synonyms = STATUS_SYNONYMS.get(status, (status,))
+        return f"lower(trim(status)) IN ({', '.join('?' for _ in synonyms)})", list(synonyms)
+
+    def _where(self, q="", status=None, vehicle_type="", service="", date_from="", date_to="",
+               include_hidden=False):
+        if include_hidden:
+            where, params = [], []
+        else:
+            where, params = [f"NOT {self._HIDDEN}"], list(self._OTHER_STATUSES)
+        # Same matching as SubmissionIndex: every query token must be the
+        # prefix of one of the row's tokens. Tokens are [a-z0-9]+, so they
+        # need no LIKE escaping.
+        for token in tokenize(q):
+            where.append("search_tokens LIKE ?")
+            params.append(f"% {token}%")
+        if status:
+            clause, values = self._status_clause(status)
+            where.append(clause)
+            params += values
+        if vehicle_type:
+            where.append("lower(trim(vehicle_type)) = ?")
+            params.append(vehicle_type.strip().lower())
+        if service:
+            where.append("(',' || lower(replace(services, ', ', ',')) || ',') LIKE ?")
+            params.append(f"%,{service.strip().lower()},%")
+        if date_from or date_to:
+            lo, hi = date_bounds(date_from, date_to)
+            where.append("timestamp >= ? AND timestamp < ?")
+            params += [lo, hi]
+        return (" WHERE " + " AND ".join(where)) if where else "", params
+
+    def search(self, q="", status=None, vehicle_type="", service="", date_from="", date_to="",
+               sort="timestamp", descending=True, offset=0, limit=50):
+        """SubmissionStore.search, answered by SQL over the stored search_tokens."""
+        clause, params = self._where(q, status, vehicle_type, service, date_from, date_to)
+        order = "timestamp" if sort == "timestamp" else "CAST(total AS REAL)"
+        direction = "DESC" if descending else "ASC"
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM submissions" + clause, params).fetchone()[0]
+        records = conn.execute(
+            f"{self._select}{clause} ORDER BY {order} {direction}, id {direction} LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        return SearchResult(total, [self._to_row(r) for r in records], self.counts())
+
+    def export(self, status=None, date_from="", date_to="", chunk=500):
+        """
+        SubmissionStore.export: rows oldest first from one cursor, ``chunk``
+        at a time. Uses its own connection, so the download reads a single
+        WAL snapshot without tying up the thread's shared one. Without a
+        status the hidden rows are included too, as on the CSV backend.
+        """
+        clause, params = self._where(status=status, date_from=date_from, date_to=date_to,
+                                     include_hidden=not status)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.execute(f"{self._select}{clause} ORDER BY timestamp, id", params)
+            while True:
+                records = cursor.fetchmany(chunk)
+                if not records:
+                    return
+                for record in records:
+                    yield self._to_row(record)
+        finally:
+            conn.close()
+
+    def counts(self):
+        counts = {"inbox": 0, "accepted": 0, "completed": 0, "trash": 0}
+        for status, n in self._conn().execute(
+            f"SELECT status, COUNT(*) FROM submissions WHERE NOT {self._HIDDEN} GROUP BY status", self._OTHER_STATUSES
+        ):
+            counts[status_bucket(status)] += n
+        return counts
+
+    def facets(self):
+        conn = self._conn()
+        vehicle_types = [r[0] for r in conn.execute(
+            "SELECT DISTINCT lower(trim(vehicle_type)) FROM submissions WHERE trim(vehicle_type) != '' ORDER BY 1"
+        )]
+        services = set()
+        for (value,) in conn.execute("SELECT DISTINCT services FROM submissions"):
+            services.update(services_of({"Services": value}))
+        return {"vehicle_types": vehicle_types, "services": sorted(services)}
+
+    def import_rows(self, rows):
+        """Insert rows whose id isn't stored yet; returns how many were added."""
+        with self._conn() as conn:
+            before = conn.total_changes
+            self._insert(conn, [dict(row, id=row.get("id") or str(uuid.uuid4())) for row in rows], ignore_existing=True)
+            added = conn.total_changes - before
+            if added:
+                self._bump(conn)
+        return added
+
+
+class CsvTestimonialStore:
+    """Testimonials in a header-less CSV, appended under the shared file lock."""
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+
+    def refresh(self):
+        """A cheap change marker: (inode, size, mtime) of the CSV."""
+        try:
+            st = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def rows(self):
+        if not os.path.isfile(self.csv_path):
+            return []
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f, fieldnames=TESTIMONIAL_FIELDS)
+            return [row for row in reader if row and (row.get('name') or '').strip()]
+
+    def append(self, row):
+        buf = io.StringIO(newline="")
+        csv.writer(buf).writerow([row.get(field, "") for field in TESTIMONIAL_FIELDS])
+        with locked(self.csv_path, shared=True):
+            append_record(self.csv_path, buf.getvalue().encode("utf-8"))
+        return row
+
+
+class SqliteTestimonialStore(_SqliteBase):
+    meta_name = "testimonials"
+
+    def rows(self):
+        records = self._conn().execute(
+            f"SELECT {', '.join(TESTIMONIAL_COLUMNS)} FROM testimonials WHERE name != '' ORDER BY id"
+        )
+        return [dict(zip(TESTIMONIAL_FIELDS, record)) for record in records]
+
+    def append(self, row):
+        with self._conn() as conn:
+            self._insert(conn, [row])
+            self._bump(conn)
+        return row
+
+    @staticmethod
+    def _insert(conn, rows):
+        conn.executemany(
+            f"INSERT INTO testimonials ({', '.join(TESTIMONIAL_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in TESTIMONIAL_COLUMNS)})",
+            ([row.get(field, "") or "" for field in TESTIMONIAL_FIELDS] for row in rows),
+        )
+
+    def import_rows(self, rows):
+        with self._conn() as conn:
+            if conn.execute("SELECT COUNT(*) FROM testimonials").fetchone()[0]:
+                return 0  # already migrated; testimonials have no natural key
+            self._insert(conn, rows)
+            self._bump(conn)
+        return len(rows)
+
+
+def open_submission_store(backend, csv_path, sqlite_path):
+    if backend == "sqlite":
+        return SqliteSubmissionStore(sqlite_path)
+    return SubmissionStore(csv_path)
+
+
+def open_testimonial_store(backend, csv_path, sqlite_path):
+    if backend == "sqlite":
+        return SqliteTestimonialStore(sqlite_path)
+    return CsvTestimonialStore(csv_path)
+
+
+def migrate(csv_path, testimonials_path, sqlite_path):
+    """One-shot import of the CSV stores into SQLite. Safe to re-run."""
+    submissions = SqliteSubmissionStore(sqlite_path)
+    added = submissions.import_rows(SubmissionStore(csv_path).rows())
+    print(f"Imported {added} submissions into {sqlite_path}")
+    testimonials = SqliteTestimonialStore(sqlite_path)
+    added = testimonials.import_rows(CsvTestimonialStore(testimonials_path).rows())
+    print(f"Imported {added} testimonials into {sqlite_path}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    load_dotenv(os.path.join(base_dir, ".env"))  # SQLITE_PATH, as the web app sees it
+    parser = argparse.ArgumentParser(description="Import database.csv and testimonials.csv into SQLite.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--csv", default=os.path.join(base_dir, "database.csv"))
+    parser.add_argument("--testimonials", default=os.path.join(base_dir, "testimonials.csv"))
+    parser.add_argument("--db", default=os.getenv("SQLITE_PATH", os.path.join(base_dir, "site.db")))
+    args = parser.parse_args()
+    migrate(args.csv, args.testimonials, args.db)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Hammer a scratch database.csv from many processes at once and check that
+no submission or status change is lost.
+
+    python stress_submissions.py --procs 8 --rows 200
+
+Each worker appends rows through its own SubmissionStore (like separate
+WSGI workers) and flips the status of rows it wrote, with a small
+compaction threshold so rewrites race against appends.
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+from submission_store import SubmissionStore
+
+STATUSES = ["inbox", "accepted", "completed", "trash"]
+
+
+def worker(csv_path, worker_id, rows, compact_every):
+    store = SubmissionStore(csv_path, compact_every=compact_every)
+    rng = random.Random(worker_id)
+    expected = {}
+    for n in range(rows):
+        row = store.append({"Name": f"worker{worker_id}-{n}", "Status": "inbox"})
+        expected[row["id"]] = "inbox"
+        sid = rng.choice(list(expected))
+        status = rng.choice(STATUSES)
+        if not store.set_status(sid, status):
+            raise RuntimeError(f"worker {worker_id} lost its own row {sid}")
+        expected[sid] = status
+    store.compact()
+    return expected
+
+
+def run(procs, rows, compact_every):
+    tmp_dir = tempfile.mkdtemp(prefix="stress_submissions_")
+    csv_path = os.path.join(tmp_dir, "database.csv")
+    with multiprocessing.Pool(procs) as pool:
+        results = pool.starmap(worker, [(csv_path, w, rows, compact_every) for w in range(procs)])
+
+    expected = {}
+    for result in results:
+        expected.update(result)
+    actual = {row["id"]: row["Status"] for row in SubmissionStore(csv_path).rows()}
+
+    missing = set(expected) - set(actual)
+    wrong = {sid for sid in expected if sid in actual and actual[sid] != expected[sid]}
+    print(f"{procs} processes x {rows} rows -> {len(actual)} rows on disk ({csv_path})")
+    print(f"missing rows: {len(missing)}, wrong statuses: {len(wrong)}")
+    return not missing and not wrong and len(actual) == procs * rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--compact-every", type=int, default=25)
+    args = parser.parse_args()
+    ok = run(args.procs, args.rows, args.compact_every)
+    print("✅ No lost writes" if ok else "❌ Lost writes detected")
+    sys.exit(0 if ok else 1)
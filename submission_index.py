@@ -0,0 +1,260 @@
+import re
+import bisect
+from collections import defaultdict, namedtuple
+
+# Free-text search covers these columns.
+SEARCH_FIELDS = ("Name", "Email", "Car", "Phone", "Message")
+# Inbox rows with none of these filled in are bot noise and stay hidden.
+CONTENT_FIELDS = ("Name", "Email", "Car", "Message")
+STATUS_SYNONYMS = {
+    "accepted": ("accepted", "accept"),
+    "completed": ("completed", "complete", "done"),
+    "trash": ("trash", "deleted", "deleted-by-user"),
+}
+BUCKETS = ("inbox", "accepted", "completed", "trash")
+SORT_KEYS = ("timestamp", "total")
+
+SearchResult = namedtuple("SearchResult", ["total", "rows", "counts"])
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def status_bucket(status):
+    """Dashboard bucket for a raw Status value; anything unrecognised is inbox."""
+    status = str(status or "").strip().lower()
+    for bucket, synonyms in STATUS_SYNONYMS.items():
+        if status in synonyms:
+            return bucket
+    return "inbox"
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text or "").lower())
+
+
+def search_tokens(row):
+    """What a row can be found by: the words in SEARCH_FIELDS, plus the phone's digits."""
+    tokens = set()
+    for field in SEARCH_FIELDS:
+        tokens.update(tokenize(row.get(field)))
+    digits = re.sub(r"\D", "", row.get("Phone") or "")
+    if digits:
+        tokens.add(digits)  # "5551234" finds "555-1234"
+    return tokens
+
+
+def parse_total(value):
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+
+def services_of(row):
+    return [s.strip().lower() for s in (row.get("Services") or "").split(",") if s.strip()]
+
+
+def has_content(row):
+    return any((row.get(f) or "").strip() for f in CONTENT_FIELDS)
+
+
+def date_bounds(date_from, date_to):
+    """Timestamp range for inclusive YYYY-MM-DD bounds (either may be empty)."""
+    # "~" sorts after every character in "YYYY-MM-DD HH:MM:SS".
+    return (date_from or ""), ((date_to + "~") if date_to else "~")
+
+
+class SubmissionIndex:
+    """
+    Search structures over the submission rows, updated one row or status
+    change at a time: an inverted token index (prefix-searchable through a
+    sorted vocabulary), per-status/vehicle/service id sets, and rows kept
+    sorted by Timestamp and by Total.
+
+    Holds references to the store's own row dicts, so it costs ids and
+    tuples, not copies of the rows. Not thread-safe; the store calls it
+    under its lock.
+    """
+
+    # Above this many rows in one batch, re-sort the sort indexes once
+    # instead of inserting each row.
+    BULK = 64
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._rows = {}
+        self._tokens = defaultdict(set)
+        self._vocab = []
+        self._vocab_dirty = False
+        self._status = {bucket: set() for bucket in BUCKETS}
+        self._bucket_of = {}
+        self._empty = set()
+        self._vehicle = defaultdict(set)
+        self._service = defaultdict(set)
+        self._by_time = []  # (Timestamp, id)
+        self._by_total = []  # (Total, id)
+
+    def __len__(self):
+        return len(self._rows)
+
+    # -- updates -----------------------------------------------------------
+
+    def add_many(self, rows):
+        rows = [row for row in rows if row["id"] not in self._rows]
+        bulk = len(rows) > self.BULK
+        for row in rows:
+            self._add(row, bulk)
+        if bulk:
+            self._by_time.sort()
+            self._by_total.sort()
+
+    def add(self, row):
+        if row["id"] not in self._rows:
+            self._add(row, bulk=False)
+
+    def _add(self, row, bulk):
+        sid = row["id"]
+        self._rows[sid] = row
+        for token in search_tokens(row):
+            if token not in self._tokens:
+                self._vocab_dirty = True
+            self._tokens[token].add(sid)
+        if not has_content(row):
+            self._empty.add(sid)
+        self._place(sid, status_bucket(row.get("Status")))
+        vehicle = (row.get("Vehicle Type") or "").strip().lower()
+        if vehicle:
+            self._vehicle[vehicle].add(sid)
+        for service in services_of(row):
+            self._service[service].add(sid)
+        entries = ((row.get("Timestamp") or "", sid), (parse_total(row.get("Total")), sid))
+        if bulk:
+            self._by_time.append(entries[0])
+            self._by_total.append(entries[1])
+        else:
+            bisect.insort(self._by_time, entries[0])
+            bisect.insort(self._by_total, entries[1])
+
+    def _place(self, sid, bucket):
+        old = self._bucket_of.get(sid)
+        if old is not None:
+            self._status[old].discard(sid)
+        if bucket == "inbox" and sid in self._empty:
+            self._bucket_of.pop(sid, None)  # hidden
+            return
+        self._status[bucket].add(sid)
+        self._bucket_of[sid] = bucket
+
+    def set_status(self, sid, status):
+        if sid in self._rows:
+            self._place(sid, status_bucket(status))
+
+    # -- queries -----------------------------------------------------------
+
+    def counts(self):
+        return {bucket: len(ids) for bucket, ids in self._status.items()}
+
+    def vehicle_types(self):
+        return sorted(v for v, ids in self._vehicle.items() if ids)
+
+    def services(self):
+        return sorted(s for s, ids in self._service.items() if ids)
+
+    def _matching(self, prefix):
+        """Ids of rows with any token starting with ``prefix``."""
+        if self._vocab_dirty:
+            self._vocab = sorted(self._tokens)
+            self._vocab_dirty = False
+        i = bisect.bisect_left(self._vocab, prefix)
+        matched = set()
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            matched |= self._tokens[self._vocab[i]]
+            i += 1
+        return matched
+
+    def scan(self, status=None, date_from="", date_to="", after=None, limit=500):
+        """
+        Up to ``limit`` rows in Timestamp order, starting after the
+        ``(Timestamp, id)`` key ``after``. Returns the rows and the key to
+        resume from, or None once the range is exhausted. Resuming by key
+        rather than position keeps it correct while rows are being added.
+
+        Without a ``status`` every row is scanned, hidden ones included; a
+        status gives that bucket as listed, so without the hidden rows.
+        """
+        lo_ts, hi_ts = date_bounds(date_from, date_to)
+        order = self._by_time
+        start = bisect.bisect_right(order, after) if after else bisect.bisect_left(order, (lo_ts,))
+        stop = bisect.bisect_left(order, (hi_ts,))
+        wanted = self._status.get(status, set()) if status else self._rows
+        rows = []
+        for pos in range(start, stop):
+            sid = order[pos][1]
+            if sid in wanted:
+                rows.append(self._rows[sid])
+                if len(rows) == limit:
+                    return rows, order[pos]
+        return rows, None
+
+    def search(self, q="", status=None, vehicle_type="", service="", date_from="", date_to="",
+               sort="timestamp", descending=True, offset=0, limit=50):
+        sets = [self._matching(token) for token in tokenize(q)]
+        if status:
+            sets.append(self._status.get(status, set()))
+        if vehicle_type:
+            sets.append(self._vehicle.get(vehicle_type.strip().lower(), set()))
+        if service:
+            sets.append(self._service.get(service.strip().lower(), set()))
+        candidates = None
+        if sets:
+            sets.sort(key=len)
+            candidates = set(sets[0])
+            for ids in sets[1:]:
+                candidates &= ids
+        lo_ts, hi_ts = date_bounds(date_from, date_to)
+        dated = bool(date_from or date_to)
+
+        def visible(sid):
+            return sid in self._bucket_of and (candidates is None or sid in candidates)
+
+        def in_range(sid):
+            return lo_ts <= (self._rows[sid].get("Timestamp") or "") < hi_ts
+
+        order = self._by_time if sort == "timestamp" else self._by_total
+        if sort == "timestamp":
+            start = bisect.bisect_left(order, (lo_ts,))
+            stop = bisect.bisect_left(order, (hi_ts,))
+        else:
+            start, stop = 0, len(order)
+
+        if candidates is not None and len(candidates) * 8 < stop - start:
+            # Few matches: sort just those.
+            key = (lambda sid: self._rows[sid].get("Timestamp") or "") if sort == "timestamp" \
+                else (lambda sid: parse_total(self._rows[sid].get("Total")))
+            ids = [sid for sid in candidates if sid in self._bucket_of and (not dated or in_range(sid))]
+            ids.sort(key=lambda sid: (key(sid), sid), reverse=descending)
+            return SearchResult(len(ids), [self._rows[sid] for sid in ids[offset:offset + limit]], self.counts())
+
+        # Many matches: walk the presorted index. Without a date range the
+        # total is known up front, so the walk stops once the page is full.
+        known_total = None
+        if not dated:
+            if candidates is None:
+                known_total = len(self._bucket_of)
+            elif status:
+                known_total = len(candidates)  # already within one visible bucket
+        positions = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        check_dates = dated and sort != "timestamp"
+        seen, page = 0, []
+        for pos in positions:
+            sid = order[pos][1]
+            if not visible(sid) or (check_dates and not in_range(sid)):
+                continue
+            if offset <= seen < offset + limit:
+                page.append(self._rows[sid])
+            seen += 1
+            if known_total is not None and seen >= offset + limit:
+                break
+        return SearchResult(seen if known_total is None else known_total, page, self.counts())
@@ -0,0 +1,389 @@
+import io
+import os
+import csv
+import uuid
+import threading
+
+from file_lock import locked, atomic_write, append_record
+from submission_index import SubmissionIndex
+
+HEADERS = [
+    "id",
+    "Timestamp",
+    "Name",
+    "Email",
+    "Car",
+    "Phone",
+    "Is Mobile",
+    "Contact Method",
+    "Best Time to Call",
+    "Preferred Appointment Time",
+    "Message",
+    "Vehicle Type",
+    "Services",
+    "Total",
+    "Status",
+]
+
+# Fold the journal back into the CSV once this many status changes pile up.
+COMPACT_EVERY = 200
+
+
+class SubmissionStore:
+    """
+    Quote submissions kept as an id -> row index in memory.
+
+    The CSV stays the source of truth for rows; status changes are appended
+    to a small journal next to it (``<csv>.journal``, one ``id,status`` line
+    each) so accepting or deleting a quote never rewrites the whole file.
+    A background thread folds the journal back into the CSV every
+    ``compact_every`` changes.
+    """
+
+    def __init__(self, csv_path, headers=HEADERS, compact_every=COMPACT_EVERY):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
+        self.headers = headers
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._early_status = {}
+        self._index = SubmissionIndex()
+        self._csv = _Tail(csv_path)
+        self._journal = _Tail(self.journal_path)
+        self._loaded = False
+        self._pending = 0
+        self._compacting = False
+        # Bumped whenever the indexed rows change, so callers can cache
+        # anything derived from them.
+        self.version = 0
+
+    # -- loading -----------------------------------------------------------
+
+    def _load(self):
+        self._csv.open()
+        text = self._csv.read_new()
+        reader = csv.DictReader(io.StringIO(text, newline=""))
+        self._fieldnames = reader.fieldnames or self.headers
+        self._rows = {}
+        self._early_status = {}
+        self._index.clear()
+        self._index_rows(reader)
+        self._journal.open()
+        self._pending = 0
+        self._replay_journal()
+        self._loaded = True
+        self.version += 1
+
+    def _index_rows(self, reader):
+        """
+        Add parsed rows to the index without touching the file. Rows that
+        predate the id/Status columns are left for ``backfill()``.
+        """
+        skipped = 0
+        added = []
+        for row in reader:
+            sid = (row.get("id") or "").strip()
+            if not sid:
+                skipped += 1
+                continue
+            if sid in self._rows:
+                continue  # already indexed, possibly with a journaled status
+            if sid in self._early_status:
+                row["Status"] = self._early_status.pop(sid)
+            elif row.get("Status") is None:
+                row["Status"] = "inbox"
+            self._rows[sid] = row
+            added.append(row)
+        self._index.add_many(added)
+        if skipped:
+            print(f"❌ {skipped} submissions have no id; run `python submission_store.py` to backfill")
+
+    def _replay_journal(self):
+        text = self._journal.read_new()
+        if not text:
+            return
+        for entry in csv.reader(io.StringIO(text, newline="")):
+            if len(entry) != 2:
+                continue
+            row = self._rows.get(entry[0])
+            if row is not None:
+                row["Status"] = entry[1]
+                self._index.set_status(entry[0], entry[1])
+            else:
+                # Another worker appended the row and changed its status
+                # after we read the CSV; apply it once the row shows up.
+                self._early_status[entry[0]] = entry[1]
+            self._pending += 1
+        self.version += 1
+
+    def _refresh(self):
+        """Pick up writes made by other processes since we last looked."""
+        # Shared lock: many readers and appenders at once, but never in the
+        # middle of another worker's compaction.
+        with locked(self.csv_path, shared=True):
+            self._catch_up()
+
+    def _catch_up(self):
+        if not self._loaded or self._csv.fh is None or self._csv.replaced() or self._journal.replaced():
+            self._load()  # first use, new file, or compacted underneath us
+            return
+        text = self._csv.read_new()
+        if text:
+            self._index_rows(csv.DictReader(io.StringIO(text, newline=""), fieldnames=self._fieldnames))
+            self.version += 1
+        self._replay_journal()
+
+    def refresh(self):
+        """Catch up with the files on disk and return the current version."""
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def reload(self):
+        with self._lock, locked(self.csv_path, shared=True):
+            self._load()
+
+    # -- reads -------------------------------------------------------------
+
+    def rows(self):
+        with self._lock:
+            self._refresh()
+            return list(self._rows.values())
+
+    def get(self, submission_id):
+        with self._lock:
+            self._refresh()
+            return self._rows.get(submission_id)
+
+    def search(self, **filters):
+        """Filtered, sorted page of rows; see ``SubmissionIndex.search``."""
+        with self._lock:
+            self._refresh()
+            return self._index.search(**filters)
+
+    def export(self, status=None, date_from="", date_to="", chunk=500):
+        """
+        Yield matching rows oldest first, ``chunk`` at a time, taking the
+        lock only while each chunk is copied so writers aren't held up for
+        the length of a download.
+
+        ``status=None`` exports every row, including the empty inbox rows
+        (bot noise) that the list hides; with a status only that bucket's
+        listed rows are exported, so ``inbox`` leaves the empty ones out.
+        """
+        after = None
+        while True:
+            with self._lock:
+                self._refresh()
+                rows, after = self._index.scan(status, date_from, date_to, after=after, limit=chunk)
+                rows = [dict(row) for row in rows]
+            yield from rows
+            if after is None:
+                return
+
+    def facets(self):
+        """Vehicle types and services present, for filter dropdowns."""
+        with self._lock:
+            self._refresh()
+            return {"vehicle_types": self._index.vehicle_types(), "services": self._index.services()}
+
+    # -- writes ------------------------------------------------------------
+
+    def append(self, row):
+        """Append a new submission to the CSV and the index."""
+        row = {h: row.get(h, "") for h in self.headers}
+        if not row["id"]:
+            row["id"] = str(uuid.uuid4())
+        with self._lock:
+            self._refresh()
+            if not os.path.isfile(self.csv_path):
+                with locked(self.csv_path):
+                    if not os.path.isfile(self.csv_path):
+                        with atomic_write(self.csv_path) as f:
+                            csv.DictWriter(f, fieldnames=self.headers).writeheader()
+            with locked(self.csv_path, shared=True):
+                append_record(self.csv_path, _format_rows([[row[h] for h in self.headers]]))
+            # Re-read from our last offset so rows other workers appended
+            # meanwhile are picked up too.
+            self._refresh()
+            if row["id"] not in self._rows:
+                self._rows[row["id"]] = row
+                self._index.add(row)
+                self.version += 1
+        return row
+
+    def set_status(self, submission_id, status):
+        """Record a status change; returns False if the id is unknown."""
+        return bool(self.set_statuses({submission_id: status}))
+
+    def set_statuses(self, updates):
+        """
+        Apply several status changes with one fsync'd journal append.
+        Returns the ids that were found and updated.
+        """
+        with self._lock:
+            self._refresh()
+            changed = [(sid, st) for sid, st in updates.items() if sid in self._rows]
+            if not changed:
+                return []
+            with locked(self.csv_path, shared=True):
+                append_record(self.journal_path, _format_rows(changed), fsync=True)
+            self._replay_journal()
+            if self._pending >= self.compact_every and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self._compact_in_background, daemon=True).start()
+            return [sid for sid, _ in changed]
+
+    def replace_all(self, rows):
+        """Replace every row, e.g. for bulk edits and migrations."""
+        with self._lock:
+            self._rows = {}
+            for row in rows:
+                row = {h: row.get(h, "") for h in self.headers}
+                if not row["id"]:
+                    row["id"] = str(uuid.uuid4())
+                self._rows[row["id"]] = row
+            self._index.clear()
+            self._index.add_many(self._rows.values())
+            self._loaded = True
+            self.version += 1
+            with locked(self.csv_path):
+                self._write_out()
+
+    # -- compaction --------------------------------------------------------
+
+    def compact(self):
+        """Rewrite the CSV from the index and drop the journal."""
+        with self._lock, locked(self.csv_path):
+            # Catch up under the exclusive lock so rows and journal entries
+            # written by other workers make it into the rewrite.
+            self._catch_up()
+            self._write_out()
+
+    def _write_out(self):
+        """Rewrite the CSV from the index; the caller holds the exclusive lock."""
+        with atomic_write(self.csv_path) as f:
+            writer = csv.DictWriter(f, fieldnames=self.headers, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows({h: row.get(h, "") for h in self.headers} for row in self._rows.values())
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._csv.open(at_end=True)
+        self._journal.close()
+        self._fieldnames = self.headers
+        self._pending = 0
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except OSError as e:
+            print("❌ Submission compaction failed:", e)
+        finally:
+            self._compacting = False
+
+
+class _Tail:
+    """
+    A file read incrementally from where we left off. The handle stays
+    open so the inode can't be reused; a different inode at ``path`` then
+    reliably means the file was replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = None
+        self.offset = 0
+
+    def open(self, at_end=False):
+        self.close()
+        try:
+            self.fh = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        if at_end:
+            self.offset = os.fstat(self.fh.fileno()).st_size
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+        self.fh = None
+        self.offset = 0
+
+    def replaced(self):
+        if self.fh is None:
+            return False
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.fh.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def read_new(self):
+        """Return the complete lines appended since the last call."""
+        if self.fh is None:
+            self.open()
+            if self.fh is None:
+                return ""
+        self.fh.seek(self.offset)
+        data = self.fh.read()
+        end = data.rfind(b"\n") + 1  # leave a half-written last line for later
+        self.offset += end
+        return data[:end].decode("utf-8")
+
+
+def rows_to_csv(rows, headers=HEADERS):
+    """Render submission rows (with a header line) as CSV text."""
+    buf = io.StringIO(newline="")
+    writer = csv.DictWriter(buf, fieldnames=headers, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows({h: row.get(h, "") for h in headers} for row in rows)
+    return buf.getvalue()
+
+
+def _format_rows(rows):
+    buf = io.StringIO(newline="")
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def backfill(csv_path):
+    """
+    One-time migration for CSVs written before the id and Status columns
+    existed. Run offline; the web app never rewrites the file on read.
+    """
+    if not os.path.isfile(csv_path):
+        print(f"No submissions file at {csv_path}")
+        return 0
+    with locked(csv_path):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        journal_path = csv_path + ".journal"
+        journaled = {}
+        if os.path.isfile(journal_path):
+            with open(journal_path, newline="", encoding="utf-8") as f:
+                journaled = {entry[0]: entry[1] for entry in csv.reader(f) if len(entry) == 2}
+        fixed = 0
+        for row in rows:
+            if row.get("id") in journaled:
+                row["Status"] = journaled[row["id"]]
+            if not (row.get("Status") or "").strip():
+                row["Status"] = "inbox"
+                fixed += 1
+            if not (row.get("id") or "").strip():
+                row["id"] = str(uuid.uuid4())
+                fixed += 1
+        if fixed:
+            with atomic_write(csv_path) as f:
+                writer = csv.DictWriter(f, fieldnames=HEADERS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows({h: row.get(h, "") for h in HEADERS} for row in rows)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+    print(f"Backfilled {fixed} missing id/Status values in {csv_path}")
+    return fixed
+
+
+if __name__ == "__main__":
+    import sys
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.csv")
+    backfill(sys.argv[1] if len(sys.argv) > 1 else default_path)
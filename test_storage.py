@@ -0,0 +1,89 @@
+"""
+The CSV and SQLite submission stores must answer the same admin search the
+same way. Run with ``python -m pytest test_storage.py``.
+"""
+import csv
+import sqlite3
+
+import pytest
+
+from submission_store import HEADERS
+from storage import SUBMISSION_COLUMNS, SqliteSubmissionStore, open_submission_store
+
+ROWS = [
+    {"Name": "John Smith", "Email": "john@gmail.com", "Car": "2004 350z", "Phone": "555-1234", "Status": "inbox"},
+    {"Name": "Johanna Lee", "Email": "jlee@example.com", "Car": "1995 240sx", "Phone": "(555) 987-6543", "Status": "accepted"},
+    {"Name": "Ana Kohn", "Email": "ana@gmail.com", "Car": "2019 Civic", "Phone": "", "Message": "Full detail", "Status": "completed"},
+    {"Name": "", "Email": "", "Car": "", "Phone": "555-1234", "Status": "inbox"},  # hidden bot row
+    {"Name": "Dev Patel", "Email": "dev@example.com", "Car": "2015 Camaro", "Phone": "555 1299", "Status": "trash"},
+]
+
+QUERIES = [
+    "5551234",      # phone digits against "555-1234"
+    "555",          # digit prefix
+    "555-1234",     # punctuated phone
+    "jo",           # name prefix
+    "ohn",          # not a prefix of any word
+    "gmail",        # email domain
+    "john smith",   # every token must match
+    "john civic",
+    "350",
+    "detail",
+    "",
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for i, row in enumerate(rows):
+            full = dict({h: "" for h in HEADERS}, id=f"id-{i}", Timestamp=f"2024-01-0{i + 1} 10:00:00")
+            full.update(row)
+            writer.writerow([full[h] for h in HEADERS])
+
+
+@pytest.fixture
+def stores(tmp_path):
+    csv_path = str(tmp_path / "database.csv")
+    write_csv(csv_path, ROWS)
+    sqlite_store = open_submission_store("sqlite", "", str(tmp_path / "site.db"))
+    csv_store = open_submission_store("csv", csv_path, "")
+    sqlite_store.import_rows(csv_store.rows())
+    return csv_store, sqlite_store
+
+
+def ids(result):
+    return [row["id"] for row in result.rows]
+
+
+@pytest.mark.parametrize("q", QUERIES)
+@pytest.mark.parametrize("status", [None, "inbox", "trash"])
+def test_search_matches_between_backends(stores, q, status):
+    csv_store, sqlite_store = stores
+    expected = csv_store.search(q=q, status=status)
+    got = sqlite_store.search(q=q, status=status)
+    assert ids(got) == ids(expected)
+    assert got.total == expected.total
+
+
+def test_phone_digits_and_prefixes(stores):
+    for store in stores:
+        assert ids(store.search(q="5551234")) == ["id-0"]
+        assert ids(store.search(q="ohn")) == []
+        assert ids(store.search(q="jo")) == ["id-1", "id-0"]
+
+
+def test_search_tokens_added_to_an_older_database(tmp_path):
+    db_path = str(tmp_path / "site.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"CREATE TABLE submissions ({', '.join(c + ' TEXT' for c in SUBMISSION_COLUMNS)})")
+    conn.execute(
+        f"INSERT INTO submissions VALUES ({', '.join('?' for _ in SUBMISSION_COLUMNS)})",
+        ["old-1", "2023-05-01 09:00:00", "Old Timer", "", "", "555-1234"] + [""] * (len(SUBMISSION_COLUMNS) - 7) + ["inbox"],
+    )
+    conn.commit()
+    conn.close()
+    store = SqliteSubmissionStore(db_path)
+    assert ids(store.search(q="5551234")) == ["old-1"]
+    assert ids(store.search(q="tim")) == ["old-1"]